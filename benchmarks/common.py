@@ -0,0 +1,65 @@
+"""
+Common part of benchmarks: arguments --output/--compare, metadata of results (commit, time, platform),
+saving of results to JSON and comparison with results of previous commit.
+"""
+import argparse
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def create_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--output', help="path of JSON file with results")
+    parser.add_argument('--compare', help="path of JSON file with previous results")
+    return parser
+
+
+def new_results(**fields) -> dict:
+    return {
+        'commit': git_commit(),
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        **fields,
+    }
+
+
+def save_results(results: dict, name: str, output: str = None) -> Path:
+    """
+    Write results to output or to RESULTS_DIR/<name>_<commit>.json.
+    """
+    output = Path(output) if output else RESULTS_DIR / f"{name}_{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results saved to {output}")
+    return output
+
+
+def compare(results: dict, old_path: str, items: str, key: str, ratios) -> None:
+    """
+    Print ratios new / old for items of results (results[items]) matched with previous results by key.
+    Params:
+    *ratios - function (item, old_item) -> [(name of metric, ratio)]
+    """
+    old_results = json.loads(Path(old_path).read_text())
+    old_by_key = {item[key]: item for item in old_results[items]}
+    print(f"Compare with {old_results['commit']} ({old_results['time']}), ratio = new / old:")
+    for item in results[items]:
+        old_item = old_by_key.get(item[key])
+        if old_item is None:
+            continue
+        for name, ratio in ratios(item, old_item):
+            print(f"  {item[key]!s:>8} {name:<20} {ratio:.2f}x")
@@ -0,0 +1,80 @@
+"""
+Benchmark of overhead of DB connection per request: requests are simulated by signals request_started/request_finished
+(Django closes connections on them as in web worker), each request makes one short query.
+Requests are run with CONN_MAX_AGE = 0 (new connection per request) and with persistent connection.
+
+Start with settings of DB under test (PostgreSQL, or pgbouncer with DATABASE_PGBOUNCER=True):
+    python -m benchmarks.db_connections
+    python -m benchmarks.db_connections --requests 2000 --compare benchmarks/results/<old>.json
+"""
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.common import BASE_DIR, compare, create_parser, new_results, save_results
+
+DEFAULT_REQUESTS = 500
+CONN_MAX_AGES = (0, 60)
+
+
+def bench_conn_max_age(conn_max_age: int, requests: int) -> dict:
+    from django.core.signals import request_started, request_finished
+    from django.db import connection
+
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        request_finished.send(sender=None)
+        timings.append(time.perf_counter() - start)
+    connection.close()
+
+    timings.sort()
+    return {
+        'conn_max_age': conn_max_age,
+        'requests': requests,
+        'mean_ms': round(statistics.mean(timings) * 1000, 3),
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95)] * 1000, 3),
+    }
+
+
+def ratios(item: dict, old_item: dict) -> list:
+    return [('mean_ms', item['mean_ms'] / old_item['mean_ms'])] if old_item['mean_ms'] else []
+
+
+def main(argv=None) -> dict:
+    parser = create_parser("Benchmark of overhead of DB connection per request")
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help="number of requests for each run")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'simcont.settings')
+    import django
+    django.setup()
+    from django.db import connection
+
+    results = new_results(vendor=connection.vendor, runs=[])
+    for conn_max_age in CONN_MAX_AGES:
+        item = bench_conn_max_age(conn_max_age, args.requests)
+        results['runs'].append(item)
+        print(f"CONN_MAX_AGE={conn_max_age!s:<5}: mean {item['mean_ms']} ms, p50 {item['p50_ms']} ms, "
+              f"p95 {item['p95_ms']} ms per request")
+    fresh, persistent = results['runs'][0], results['runs'][-1]
+    results['saved_ms_per_request'] = round(fresh['mean_ms'] - persistent['mean_ms'], 3)
+    print(f"Persistent connection saves {results['saved_ms_per_request']} ms per request")
+
+    save_results(results, 'db_connections', args.output)
+    if args.compare:
+        compare(results, args.compare, 'runs', 'conn_max_age', ratios)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark of NLP ingestion path: SimVoc.convert_to_txt (TXT, PDF), SimVoc.clean_text
+and create of order_lemmas as pipeline does it (split to shards -> create_lemmas_histogram -> merge).
+
+Corpora are generated (fixed seed), so results are reproducible and can be compared between commits.
+Each corpus is processed in separate process, so peak RSS belongs to exactly corpus.
+
+Start:
+    python -m benchmarks.nlp_ingestion
+    python -m benchmarks.nlp_ingestion --sizes 10KB 1MB --compare benchmarks/results/<old>.json
+"""
+import io
+import os
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.common import BASE_DIR, compare, create_parser, new_results, save_results
+
+DEFAULT_SIZES = ['10KB', '1MB', '20MB']
+PDF_MAX_SIZE = '256KB'  # pdfplumber is slow, PDF is generated from no more this part of corpus
+PDF_PAGE_SIZE = 3000  # chars on one page of generated PDF
+SEED = 42
+
+WORDS = (
+    "the be to of and a in that have it for not on with he as you do at this but his by from they we say her "
+    "she or an will my one all would there their what so up out if about who get which go me when make can like "
+    "time no just him know take people into year your good some could them see other than then now look only "
+    "come its over think also back after use two how our work first well way even new want because any these "
+    "give day most us is was are were been being has had did done said says going went gone gets got making made "
+    "books book children child running ran runs studies studying studied better best mice mouse women woman "
+    "vocabulary lemma language learner teacher student lesson word words sentence sentences translate translated "
+    "reading read reads writes writing wrote written project projects manager managers management risk risks "
+    "schedule schedules quality cost costs scope stakeholder stakeholders process processes planning plans"
+).split()
+
+
+def parse_size(size: str) -> int:
+    units = {'KB': 1024, 'MB': 1024 * 1024}
+    return int(float(size[:-2]) * units[size[-2:].upper()])
+
+
+def generate_text(size: int, seed: int = SEED) -> str:
+    """
+    Generate English-like text with Zipf distribution of words, punctuation and numbers.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    parts = []
+    length = 0
+    while length < size:
+        sentence = rng.choices(WORDS, weights=weights, k=rng.randint(5, 20))
+        if rng.random() < 0.2:
+            sentence.insert(rng.randrange(len(sentence)), str(rng.randint(1, 2024)))
+        row = " ".join(sentence).capitalize() + rng.choice(['.', '.', '!', '?', ',']) + rng.choice([' ', ' ', '\n'])
+        parts.append(row)
+        length += len(row)
+    return "".join(parts)[:size]
+
+
+def generate_pdf(text: str) -> bytes:
+    import fitz
+
+    pdf_document = fitz.open()
+    for i in range(0, len(text), PDF_PAGE_SIZE):
+        pdf_page = pdf_document.new_page()
+        pdf_page.insert_textbox(pdf_page.rect + (36, 36, -36, -36), text[i:i + PDF_PAGE_SIZE], fontsize=6)
+    pdf_bytes = pdf_document.tobytes()
+    pdf_document.close()
+    return pdf_bytes
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def bench_corpus(size_name: str, pdf_max_size: int) -> dict:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'simcont.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from drf_app.langutils import SimVoc
+
+    size = parse_size(size_name)
+    text = generate_text(size)
+    stages = {}
+
+    SimVoc.load_spacy_model()  # model load is not a part of ingestion of document
+
+    txt_file = io.BytesIO(text.encode('utf-8'))
+    txt_file.name = 'corpus.txt'
+    start = time.perf_counter()
+    SimVoc.convert_to_txt(txt_file)
+    stages['convert_txt'] = {'seconds': time.perf_counter() - start}
+
+    pdf_file = io.BytesIO(generate_pdf(text[:pdf_max_size]))
+    pdf_file.name = 'corpus.pdf'
+    start = time.perf_counter()
+    pdf_text = SimVoc.convert_to_txt(pdf_file)
+    stages['convert_pdf'] = {
+        'seconds': time.perf_counter() - start,
+        'pages': -(-min(size, pdf_max_size) // PDF_PAGE_SIZE),
+        'chars': len(pdf_text),
+    }
+
+    start = time.perf_counter()
+    clean_text = SimVoc.clean_text(text)
+    stages['clean_text'] = {'seconds': time.perf_counter() - start}
+
+    start = time.perf_counter()
+    shards = SimVoc.split_text(clean_text, settings.NLP_SHARD_SIZE)
+    lemmas_histogram = SimVoc.merge_lemmas_histograms([SimVoc.create_lemmas_histogram(shard) for shard in shards])
+    order_lemmas = SimVoc.order_lemmas_from_histogram(lemmas_histogram)
+    SimVoc.dominant_pos(lemmas_histogram)
+    seconds = time.perf_counter() - start
+    tokens = sum(order_lemmas.values())
+    stages['create_order_lemmas'] = {
+        'seconds': seconds,
+        'shards': len(shards),
+        'tokens': tokens,
+        'lemmas': len(order_lemmas),
+        'tokens_per_sec': tokens / seconds if seconds else None,
+    }
+
+    for stage in stages.values():
+        stage['seconds'] = round(stage['seconds'], 4)
+        if stage.get('tokens_per_sec'):
+            stage['tokens_per_sec'] = round(stage['tokens_per_sec'], 1)
+
+    return {
+        'size': size_name,
+        'bytes': size,
+        'stages': stages,
+        'total_seconds': round(sum(stage['seconds'] for stage in stages.values()), 4),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def ratios(item: dict, old_item: dict) -> list:
+    items = [
+        (stage, values['seconds'] / old_item['stages'][stage]['seconds'])
+        for stage, values in item['stages'].items()
+        if old_item['stages'].get(stage, {}).get('seconds')
+    ]
+    items.append(('peak_rss_mb', item['peak_rss_mb'] / old_item['peak_rss_mb']))
+    return items
+
+
+def main(argv=None) -> dict:
+    parser = create_parser("Benchmark of NLP ingestion path of SimVoc")
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help="sizes of corpora, for example 10KB 1MB")
+    parser.add_argument('--pdf-max-size', default=PDF_MAX_SIZE, help="max size of corpus part converted to PDF")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BASE_DIR))
+    results = new_results(corpora=[])
+    pdf_max_size = parse_size(args.pdf_max_size)
+    for size_name in args.sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            item = executor.submit(bench_corpus, size_name, pdf_max_size).result()
+        results['corpora'].append(item)
+        stages = ", ".join(f"{name} {values['seconds']}s" for name, values in item['stages'].items())
+        print(f"{size_name:>6}: {stages}; "
+              f"{item['stages']['create_order_lemmas']['tokens_per_sec']} tokens/sec, "
+              f"peak RSS {item['peak_rss_mb']} MB")
+
+    save_results(results, 'nlp_ingestion', args.output)
+    if args.compare:
+        compare(results, args.compare, 'corpora', 'size', ratios)
+    return results
+
+
+if __name__ == '__main__':
+    main()
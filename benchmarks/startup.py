@@ -0,0 +1,124 @@
+"""
+Benchmark of startup of processes: import time (python -X importtime) and RSS after imports
+which are done by web worker (settings, apps, URLconf with views) and by manage.py command.
+
+Each target is started in new interpreter several times, median is reported. Module list shows
+the slowest top-level imports, so heavy dependency imported at startup is visible at once.
+
+Start:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 5 --compare benchmarks/results/<old>.json
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import BASE_DIR, compare, create_parser, new_results, save_results
+
+DEFAULT_REPEAT = 3
+TOP_MODULES = 15
+
+SETUP = (
+    "import os, resource, sys, json\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'simcont.settings')\n"
+    "import django\n"
+    "django.setup()\n"
+)
+RSS = (
+    "peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+    "print(json.dumps({'peak_rss_mb': round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)}))\n"
+)
+
+# target: code which is run after django.setup()
+TARGETS = {
+    # gunicorn/uwsgi worker: WSGI application and URLconf with all views (loaded on first request)
+    'web': (
+        "from simcont.wsgi import application\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+    ),
+    # manage.py command which doesn't touch NLP, for example migrate or check
+    'manage': (
+        "from django.core.management import call_command\n"
+        "call_command('check', verbosity=0)\n"
+    ),
+}
+
+
+def parse_importtime(stderr: str) -> tuple:
+    """
+    Total import time (sum of self times) and top-level modules with cumulative time, microseconds.
+    """
+    total = 0
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total += int(self_us)
+        if not name.startswith('  '):  # nested imports are indented
+            modules.append((name.strip(), int(cumulative_us)))
+    return total, modules
+
+
+def bench_target(name: str, code: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(BASE_DIR), os.environ.get('PYTHONPATH')])))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SETUP + code + RSS],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    total, modules = parse_importtime(result.stderr)
+    return {
+        'target': name,
+        'import_ms': round(total / 1000, 1),
+        'peak_rss_mb': json.loads(result.stdout.strip().splitlines()[-1])['peak_rss_mb'],
+        'modules': modules,
+    }
+
+
+def bench(name: str, code: str, repeat: int) -> dict:
+    runs = [bench_target(name, code) for _ in range(repeat)]
+    slowest = {}
+    for run in runs:
+        for module, cumulative in run['modules']:
+            slowest.setdefault(module, []).append(cumulative)
+    top = sorted(((module, statistics.median(values)) for module, values in slowest.items()),
+                 key=lambda item: item[1], reverse=True)[:TOP_MODULES]
+    return {
+        'target': name,
+        'import_ms': statistics.median(run['import_ms'] for run in runs),
+        'peak_rss_mb': statistics.median(run['peak_rss_mb'] for run in runs),
+        'top_modules_ms': {module: round(cumulative / 1000, 1) for module, cumulative in top},
+    }
+
+
+def ratios(item: dict, old_item: dict) -> list:
+    return [
+        ('import_ms', item['import_ms'] / old_item['import_ms']),
+        ('peak_rss_mb', item['peak_rss_mb'] / old_item['peak_rss_mb']),
+    ]
+
+
+def main(argv=None) -> dict:
+    parser = create_parser("Benchmark of startup of web worker and manage.py")
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="number of starts of every target")
+    args = parser.parse_args(argv)
+
+    results = new_results(targets=[])
+    for name in args.targets:
+        item = bench(name, TARGETS[name], args.repeat)
+        results['targets'].append(item)
+        top = ", ".join(f"{module} {ms}ms" for module, ms in list(item['top_modules_ms'].items())[:5])
+        print(f"{name:>8}: imports {item['import_ms']}ms, peak RSS {item['peak_rss_mb']} MB; slowest: {top}")
+
+    save_results(results, 'startup', args.output)
+    if args.compare:
+        compare(results, args.compare, 'targets', 'target', ratios)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,9 @@ from django.contrib import admin
 from .models import *
 
 admin.site.register(Vocabulary)
+admin.site.register(VocabularySource)
 admin.site.register(Lemma)
+admin.site.register(LemmaTranslation)
 admin.site.register(VocabularyLemma)
 admin.site.register(Lang)
 admin.site.register(LearnerVocabulary)
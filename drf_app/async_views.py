@@ -0,0 +1,284 @@
+"""
+Async variants of read-mostly and dispatch endpoints for ASGI (uvicorn, daphne).
+Views use async ORM and wait for finish of translation/processing by Redis pub/sub (param wait, seconds),
+so waiting client doesn't hold worker thread. Under WSGI they work too, but each request takes a thread.
+View events pushes states of many lemmas and vocabularies by one connection (Server-Sent Events).
+"""
+import asyncio
+import json
+import uuid
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import Lang, Lemma, LemmaTranslation, Vocabulary, VocabularyLemma
+from .notifications import Subscription, translation_channel, vocabulary_channel
+from .serializers import TranslateLemmaSerializer, VocabularyProcessingSerializer
+from .tasks import translate_lemma_dispatch
+from users.authentication import CachedJWTAuthentication
+
+import logging
+logger = logging.getLogger(__name__)
+
+PROCESSING_FINISHED = (Vocabulary.ProcessingStatus.DONE, Vocabulary.ProcessingStatus.FAILED)
+TRANSLATE_FINISHED = (Lemma.TranslateStatus.TRANSLATED, Lemma.TranslateStatus.FAILED)
+
+
+def error_response(detail: str, status: int) -> JsonResponse:
+    return JsonResponse({"detail": detail}, status=status)
+
+
+async def authenticate(request):
+    """
+    User by JWT of header Authorization or None. Lookup of user is made in thread of sync_to_async.
+    """
+    try:
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    if result is None:
+        return None
+    user, _ = result
+    return user if user.is_active else None
+
+
+def get_wait(request) -> float:
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        return 0
+    return min(max(wait, 0), settings.ASYNC_WAIT_MAX)
+
+
+def available_vocabularies(user):
+    """
+    Vocabularies which user authors or learns, all for staff.
+    """
+    if user.is_staff:
+        return Vocabulary.objects.all()
+    return Vocabulary.objects.filter(Q(learners=user) | Q(author=user))
+
+
+async def get_translation(lemma_id, lang_to: str):
+    return await LemmaTranslation.objects.select_related('lemma').filter(lemma=lemma_id, lang=lang_to).afirst()
+
+
+async def dispatch_translation(lemma, lang_to: str):
+    """
+    Translation of lemma to lang_to, lemma is sent to translate if it isn't translated yet.
+    """
+    translation = await get_translation(lemma.pk, lang_to)
+    if translation is None or translation.translate_status == Lemma.TranslateStatus.ROOKIE:
+        await sync_to_async(translate_lemma_dispatch)(lemma.pk, lang_to)
+        translation = await get_translation(lemma.pk, lang_to)
+        logger.info("Start process of translate lemma: %s, with strategy: %s",
+                    lemma.lemma, settings.DEFAULT_STRATEGY_TRANSLATE)
+    return translation
+
+
+def translation_data(lemma, lang_to: str, translation) -> dict:
+    if translation is None:
+        translation = LemmaTranslation(lemma=lemma, lang=lang_to, pos=lemma.pos)
+    return TranslateLemmaSerializer(translation).data
+
+
+async def lemma_translate(request, pk):
+    """
+    Async variant of LemmaViewSet.translate: translation of lemma to lang_to, lemma is sent to translate
+    if it isn't translated yet. With param wait (seconds) response is returned when translation is finished
+    or wait passed.
+    """
+    if request.method != 'GET':
+        return error_response(f'Method "{request.method}" not allowed.', 405)
+    if await authenticate(request) is None:
+        return error_response("Authentication credentials were not provided.", 401)
+
+    lang_to = request.GET.get('lang_to', settings.DEFAULT_LANG_TO_TRANSLATE)
+    if not await Lang.objects.filter(short_name=lang_to).aexists():
+        return error_response("Invalid value for 'lang_to'.", 400)
+    try:
+        lemma = await Lemma.objects.aget(pk=pk)
+    except Lemma.DoesNotExist:
+        return error_response("Not found.", 404)
+
+    wait = get_wait(request)
+    async with Subscription(translation_channel(lemma.pk, lang_to)) if wait else nullcontext() as subscription:
+        translation = await dispatch_translation(lemma, lang_to)
+        if (subscription is not None and translation is not None
+                and translation.translate_status not in TRANSLATE_FINISHED):
+            if await subscription.wait(wait) is not None:
+                translation = await get_translation(lemma.pk, lang_to)
+
+    return JsonResponse(translation_data(lemma, lang_to, translation))
+
+
+async def vocabulary_processing(request, pk):
+    """
+    Async variant of VocabularyViewSet.processing: status and progress of processing of vocabulary.
+    With param wait (seconds) response is returned when processing is finished or wait passed.
+    """
+    if request.method != 'GET':
+        return error_response(f'Method "{request.method}" not allowed.', 405)
+    user = await authenticate(request)
+    if user is None:
+        return error_response("Authentication credentials were not provided.", 401)
+
+    queryset = available_vocabularies(user).filter(pk=pk).only('id', 'processing_status', 'processing_progress')
+    wait = get_wait(request)
+    async with Subscription(vocabulary_channel(pk)) if wait else nullcontext() as subscription:
+        vocabulary = await queryset.afirst()
+        if vocabulary is None:
+            return error_response("Not found.", 404)
+        if subscription is not None and vocabulary.processing_status not in PROCESSING_FINISHED:
+            if await subscription.wait(wait) is not None:
+                vocabulary = await queryset.afirst()
+
+    return JsonResponse(VocabularyProcessingSerializer(vocabulary).data)
+
+
+def parse_ids(values: list) -> list:
+    """
+    UUIDs of query params without duplicates, ValueError for invalid value.
+    """
+    return list(dict.fromkeys(str(uuid.UUID(value)) for value in values))
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def translation_event(lemma_id: str, lang_to: str, dispatch: bool = False):
+    """
+    State of translation as (data, finished). Lemma is sent to translate if dispatch.
+    """
+    lemma = await Lemma.objects.filter(pk=lemma_id).afirst()
+    if lemma is None:
+        return {"id": lemma_id, "detail": "Not found."}, True
+    if dispatch:
+        translation = await dispatch_translation(lemma, lang_to)
+    else:
+        translation = await get_translation(lemma_id, lang_to)
+    data = translation_data(lemma, lang_to, translation)
+    return data, data['translate_status'] in TRANSLATE_FINISHED
+
+
+async def vocabulary_event(voc_id: str):
+    """
+    State of processing of vocabulary as (data, finished).
+    """
+    vocabulary = await Vocabulary.objects.filter(pk=voc_id).only(
+        'id', 'processing_status', 'processing_progress'
+    ).afirst()
+    if vocabulary is None:
+        return {"id": voc_id, "detail": "Not found."}, True
+    data = VocabularyProcessingSerializer(vocabulary).data
+    return data, data['processing_status'] in PROCESSING_FINISHED
+
+
+async def filter_available(user, lemmas: list, vocabularies: list) -> tuple:
+    """
+    Sets of ids of lemmas and vocabularies available to user: vocabularies which user authors or learns
+    and lemmas of them. Staff gets all ids.
+    """
+    if user.is_staff:
+        return set(lemmas), set(vocabularies)
+    available = available_vocabularies(user)
+    lemmas_id = VocabularyLemma.objects.filter(
+        throughLemma__in=lemmas, throughVocabulary__in=available.values('pk'),
+    ).values_list('throughLemma', flat=True)
+    vocabularies_id = available.filter(pk__in=vocabularies).values_list('pk', flat=True)
+    return {str(pk) async for pk in lemmas_id}, {str(pk) async for pk in vocabularies_id}
+
+
+async def stream_events(lemmas: list, vocabularies: list, lang_to: str, timeout: float, not_found: list = ()):
+    """
+    Current state of each lemma/vocabulary, then new state after each notification of task.
+    Stream is finished when all lemmas are translated and all vocabularies are processed, or timeout passed.
+    not_found - (event, id) of objects which are not available to user, they are not subscribed.
+    """
+    for event, pk in not_found:
+        yield format_event(event, {"id": pk, "detail": "Not found."})
+    if not lemmas and not vocabularies:
+        yield format_event('end', {"pending": []})
+        return
+
+    channels = {translation_channel(lemma_id, lang_to): ('translation', lemma_id) for lemma_id in lemmas}
+    channels.update({vocabulary_channel(voc_id): ('vocabulary', voc_id) for voc_id in vocabularies})
+
+    async def get_event(event: str, pk: str, dispatch: bool = False):
+        if event == 'translation':
+            return await translation_event(pk, lang_to, dispatch)
+        return await vocabulary_event(pk)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    async with Subscription(*channels) as subscription:
+        pending = set()
+        for channel, (event, pk) in channels.items():
+            data, finished = await get_event(event, pk, dispatch=True)
+            yield format_event(event, data)
+            if not finished:
+                pending.add(channel)
+
+        while pending and (remaining := deadline - loop.time()) > 0:
+            message = await subscription.wait(min(remaining, settings.ASYNC_STREAM_KEEPALIVE))
+            if message is None:
+                yield ": keepalive\n\n"  # comment of SSE, proxies don't close idle connection
+                continue
+            channel, _ = message
+            if channel not in pending:
+                continue
+            event, pk = channels[channel]
+            data, finished = await get_event(event, pk)
+            yield format_event(event, data)
+            if finished:
+                pending.discard(channel)
+
+    yield format_event('end', {"pending": [channels[channel][1] for channel in pending]})
+
+
+async def events(request):
+    """
+    Server-Sent Events with states of lemmas (param lemma, repeated, translations to lang_to) and vocabularies
+    (param vocabulary, repeated). Lemmas not translated yet are sent to translate. Event is sent on start and
+    when task finishes translation/processing, stream is closed when all are finished or after timeout (seconds).
+    """
+    if request.method != 'GET':
+        return error_response(f'Method "{request.method}" not allowed.', 405)
+    user = await authenticate(request)
+    if user is None:
+        return error_response("Authentication credentials were not provided.", 401)
+
+    lang_to = request.GET.get('lang_to', settings.DEFAULT_LANG_TO_TRANSLATE)
+    if not await Lang.objects.filter(short_name=lang_to).aexists():
+        return error_response("Invalid value for 'lang_to'.", 400)
+    try:
+        lemmas = parse_ids(request.GET.getlist('lemma'))
+        vocabularies = parse_ids(request.GET.getlist('vocabulary'))
+        timeout = min(max(float(request.GET.get('timeout', settings.ASYNC_STREAM_MAX)), 0), settings.ASYNC_STREAM_MAX)
+    except ValueError:
+        return error_response("Invalid value for 'lemma', 'vocabulary' or 'timeout'.", 400)
+    if not lemmas and not vocabularies:
+        return error_response("Params 'lemma' or 'vocabulary' are required.", 400)
+    if len(lemmas) + len(vocabularies) > settings.ASYNC_STREAM_CHANNELS_MAX:
+        return error_response(f"No more {settings.ASYNC_STREAM_CHANNELS_MAX} lemmas and vocabularies.", 400)
+
+    # Only lemmas and vocabularies of vocabularies which user authors or learns are subscribed
+    available_lemmas, available_vocabularies_id = await filter_available(user, lemmas, vocabularies)
+    not_found = [('translation', pk) for pk in lemmas if pk not in available_lemmas]
+    not_found += [('vocabulary', pk) for pk in vocabularies if pk not in available_vocabularies_id]
+    response = StreamingHttpResponse(
+        stream_events(
+            [pk for pk in lemmas if pk in available_lemmas],
+            [pk for pk in vocabularies if pk in available_vocabularies_id],
+            lang_to, timeout, not_found,
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx doesn't buffer stream
+    return response
@@ -0,0 +1,102 @@
+"""
+Streaming export of lemmas of vocabulary with frequencies and translations.
+Rows are read by server-side cursor and written chunk by chunk, so memory doesn't depend on size of vocabulary.
+Under ASGI chunks are given by async iterator (aiter_chunks), else Django reads sync iterator to the end before send.
+"""
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import OuterRef, Subquery
+
+from .models import VocabularyLemma, LemmaTranslation
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = ('lemma', 'frequency', 'pos', 'translation', 'pronunciation')
+
+
+class Echo:
+    """
+    Object with write() which returns value instead of keep it, for csv.writer in streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_vocabulary_rows(voc_id, lang_to: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Rows (lemma, frequency, pos, translation, pronunciation) ordered by frequency.
+    """
+    translations = LemmaTranslation.objects.filter(lemma=OuterRef('throughLemma'), lang=lang_to)
+    rows = VocabularyLemma.objects.filter(
+        throughVocabulary=voc_id,
+    ).annotate(
+        translate=Subquery(translations.values('translate')[:1]),
+    ).order_by('-frequency', 'throughLemma__lemma').values_list(
+        'throughLemma__lemma', 'frequency', 'throughLemma__pos', 'translate',
+    ).iterator(chunk_size=chunk_size)
+
+    for lemma, frequency, pos, translate in rows:
+        translation, pronunciation = parse_translate(translate)
+        yield lemma, frequency, pos, translation, pronunciation
+
+
+async def aiter_chunks(iterator, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Async iterator over sync iterator of export for StreamingHttpResponse under ASGI. Chunks are read
+    in thread of sync_to_async (the same thread for all chunks, so cursor of DB stays in its connection).
+    """
+    next_chunk = sync_to_async(lambda: list(islice(iterator, chunk_size)))
+    while chunk := await next_chunk():
+        yield "".join(chunk)
+
+
+def parse_translate(translate) -> tuple:
+    """
+    Text and pronunciation of main translate from JSON of translation (see SimVoc.create_translation_json).
+    """
+    if not translate:
+        return "", ""
+    try:
+        if isinstance(translate, str):
+            translate = json.loads(translate)
+        main_translate = translate.get("main_translate") or []
+        return main_translate[2] or "", main_translate[1] or ""
+    except (ValueError, AttributeError, IndexError):
+        return "", ""
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+
+
+def export_anki(rows):
+    """
+    TSV for import to Anki: front (lemma), back (translation and pronunciation), tags (part of speech).
+    """
+    yield "#separator:tab\n#html:false\n#columns:Front\tBack\tTags\n"
+    for lemma, frequency, pos, translation, pronunciation in rows:
+        back = f"{translation} [{pronunciation}]" if pronunciation else translation
+        yield "\t".join(clean_tsv(value) for value in (lemma, back, pos or "")) + "\n"
+
+
+def clean_tsv(value: str) -> str:
+    return value.replace("\t", " ").replace("\n", " ")
+
+
+# file_format: (function, content type, extension of file)
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (export_ndjson, 'application/x-ndjson; charset=utf-8', 'ndjson'),
+    'anki': (export_anki, 'text/tab-separated-values; charset=utf-8', 'txt'),
+}
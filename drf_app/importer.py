@@ -0,0 +1,106 @@
+"""
+Import of ready frequency lists (lemma, frequency, pos) to vocabulary without NLP.
+File is read row by row and lemmas are saved by batches (see VocabularyLemma.upsert).
+"""
+import codecs
+import csv
+import json
+import os
+
+from .models import Lemma, Vocabulary, VocabularyLemma
+
+IMPORT_FORMATS = ('csv', 'json', 'ndjson')
+IMPORT_BATCH_SIZE = 1000
+
+
+class FrequencyListError(ValueError):
+    pass
+
+
+def get_file_format(file_obj, file_format: str = None) -> str:
+    if file_format:
+        return file_format
+    _, file_extension = os.path.splitext(file_obj.name or '')
+    return file_extension.lower().lstrip('.') or 'csv'
+
+
+def iter_frequency_list(file_obj, file_format: str):
+    """
+    Rows (lemma, frequency, pos) of file. Columns of CSV (with header): lemma, frequency, pos;
+    JSON is list of objects and NDJSON is object per line with the same keys. Raise FrequencyListError.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(codecs.iterdecode(file_obj, 'utf-8-sig'))
+        if not reader.fieldnames or 'lemma' not in reader.fieldnames:
+            raise FrequencyListError("CSV must have header with column 'lemma'.")
+        items = reader
+    elif file_format == 'ndjson':
+        items = (parse_json(line) for line in file_obj if line.strip())
+    elif file_format == 'json':
+        items = parse_json(file_obj.read())
+        if not isinstance(items, list):
+            raise FrequencyListError("JSON must be list of objects.")
+    else:
+        raise FrequencyListError(f"Format of file must be one of: {', '.join(IMPORT_FORMATS)}.")
+
+    try:
+        for number, item in enumerate(items, start=1):
+            yield parse_item(item, number)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise FrequencyListError(f"Invalid file: {e}")
+
+
+def import_frequency_list(voc_id, rows, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Save rows (lemma, frequency, pos) to vocabulary by batches. Frequency of repeated lemma is replaced by last one.
+    order_lemmas of vocabulary is rebuilt from saved rows.
+    Call it in transaction, so error in any row cancels import.
+    """
+    result = {'lemmas': 0, 'created_lemmas': 0, 'created': 0, 'updated': 0}
+    frequencies = {}
+    pos = {}
+
+    def save_batch():
+        for key, value in VocabularyLemma.upsert(voc_id, frequencies, pos, batch_size=batch_size).items():
+            result[key] += value
+        frequencies.clear()
+        pos.clear()
+
+    for lemma, frequency, lemma_pos in rows:
+        result['lemmas'] += 1
+        frequencies[lemma] = frequency
+        pos[lemma] = lemma_pos
+        if len(frequencies) >= batch_size:
+            save_batch()
+    if frequencies:
+        save_batch()
+    Vocabulary.refresh_order_lemmas(voc_id)
+    return result
+
+
+def parse_json(data):
+    try:
+        return json.loads(data)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise FrequencyListError(f"Invalid JSON: {e}")
+
+
+def parse_item(item, number: int) -> tuple:
+    if not isinstance(item, dict):
+        raise FrequencyListError(f"Row {number}: object with key 'lemma' is expected.")
+
+    lemma = str(item.get('lemma') or '').strip().lower()
+    if not lemma or len(lemma) > Lemma._meta.get_field('lemma').max_length:
+        raise FrequencyListError(f"Row {number}: invalid lemma.")
+
+    try:
+        frequency = int(item.get('frequency') or 0)
+    except (TypeError, ValueError):
+        raise FrequencyListError(f"Row {number}: frequency must be integer.")
+    if frequency < 0:
+        raise FrequencyListError(f"Row {number}: frequency must not be negative.")
+
+    pos = str(item.get('pos') or Lemma.Pos.X).strip().upper()
+    if pos not in Lemma.Pos.values:
+        raise FrequencyListError(f"Row {number}: unknown part of speech '{pos}'.")
+    return lemma, frequency, pos
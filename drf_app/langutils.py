@@ -2,31 +2,23 @@
 import json
 import os
 import re
-import time
 from collections import defaultdict
 from datetime import datetime
 from enum import Enum
 from typing import Any
 
-import pdfplumber
-from googletrans import Translator, LANGUAGES
-
-# https://platform.openai.com/docs/quickstart?context=python
-import openai
-# from openai import OpenAI
-
-# https://github.com/xtekky/gpt4free?tab=readme-ov-file#-getting-started
-import g4f
-# from g4f.client import Client
-
-# https://spacy.io/usage
-import spacy
-from random_word import RandomWords
+# Providers of NLP and translation are imported on first use (see SimVoc), so web workers and
+# manage.py commands which don't process documents don't pay for import of them:
+# https://spacy.io/usage - spacy
+# https://github.com/jsvine/pdfplumber - pdfplumber
+# https://pypi.org/project/googletrans/ - googletrans
+# https://github.com/xtekky/gpt4free?tab=readme-ov-file#-getting-started - g4f
+# https://platform.openai.com/docs/quickstart?context=python - openai
+# https://github.com/tqdm/tqdm - tqdm (progress bars of console mode)
 
 # https://gtts.readthedocs.io/en/latest/index.html
 # from gtts import gTTS
 
-from tqdm import tqdm
 import uuid
 import logging
 
@@ -40,11 +32,17 @@ else:
     from simcont import settings
     logging.config.dictConfig(settings.LOGGING)
 
+from simcont.prometheus import stage_timer, NLP_TOKENS
+
 logger = logging.getLogger(__name__)
 logger.setLevel(settings.LOGGING_LEVEL)
 # print(f"Level of logging set up on: {logger.getEffectiveLevel()}")
 
-openai.api_key = settings.OPENAI_API_KEY
+
+class UnsupportedLanguage(ValueError):
+    """
+    Strategy of translate doesn't support language, error of input (not of provider).
+    """
 
 
 class PartSpeech(str, Enum):
@@ -73,6 +71,7 @@ class SimVoc:
     SimVoc - class which contain specifically functions for handle vocabulary for app SimCont
     """
     SPACY_MODEL = "en_core_web_sm"
+    PROGRESS_CHUNK_SIZE = 10000  # tokens between updates of progress bar in console mode
     NLP_MAX_LENGTH = int(settings.NLP_MAX_LENGTH)
     nlp_instance = None
     prompt_to_ai = (
@@ -105,6 +104,20 @@ class SimVoc:
         "VERB": PartSpeech.VERB
     }
 
+    # Names of parts of speech in dictionary of googletrans
+    gtrans_pos_mapping = {
+        "adjective": PartSpeech.ADJ,
+        "adverb": PartSpeech.ADV,
+        "article": PartSpeech.DET,
+        "conjunction": PartSpeech.CCONJ,
+        "interjection": PartSpeech.INTJ,
+        "noun": PartSpeech.NOUN,
+        "particle": PartSpeech.PART,
+        "preposition": PartSpeech.ADP,
+        "pronoun": PartSpeech.PRON,
+        "verb": PartSpeech.VERB,
+    }
+
     def __init__(
             self,
             id_voc: uuid.UUID = None,
@@ -135,6 +148,8 @@ class SimVoc:
     @classmethod
     def load_spacy_model(cls):
         if cls.nlp_instance is None:
+            import spacy
+
             cls.nlp_instance = spacy.load(cls.SPACY_MODEL)
             cls.nlp_instance.max_length = cls.NLP_MAX_LENGTH
 
@@ -145,6 +160,7 @@ class SimVoc:
                 logger.info(f"{lemma}: {frequency}")
 
     @staticmethod
+    @stage_timer('convert')
     def convert_to_txt(file_obj, cons_mode=False):
         """
         Support file's format:
@@ -154,8 +170,12 @@ class SimVoc:
         doc_txt = ""
         _, file_extension = os.path.splitext(file_obj.name)
         if file_extension.lower() == '.pdf':
+            import pdfplumber
+
             with pdfplumber.open(file_obj) as pdf:
                 if cons_mode:
+                    from tqdm import tqdm
+
                     progress_bar = tqdm(total=len(pdf.pages), desc="Read pages...", unit="page", unit_scale=1)
                     for page in pdf.pages:
                         doc_txt += page.extract_text()
@@ -171,6 +191,7 @@ class SimVoc:
             return ""
 
     @staticmethod
+    @stage_timer('clean')
     def clean_text(row_text: str, cons_mode: bool = False) -> str:
         if cons_mode:
             logger.info(f'Cleaning punctuation marks...')
@@ -190,12 +211,13 @@ class SimVoc:
         return str(clearing_text)
 
     @staticmethod
-    def create_order_lemmas(source_text: str, cons_mode: bool = False) -> dict:
+    @stage_timer('lemmatize')
+    def create_lemmas_histogram(source_text: str, cons_mode: bool = False) -> dict:
         """
-        Order like this:
+        Frequencies of lemma by part of speech (pos_mapping), it is collected in the same run of spaCy:
         json {
-            'lemma1': 12,
-            'lemma2': 11
+            'lemma1': {'NOUN': 10, 'VERB': 2},
+            'lemma2': {'ADJ': 11}
               }
         """
         # Load the 'en_core_web_sm' model
@@ -204,28 +226,111 @@ class SimVoc:
         # Process the sentence using the loaded model
         # doc = nlp(source_text)
         doc = SimVoc.nlp_instance(source_text.lower())
-        unsorted_result = defaultdict(int)
+        histogram = defaultdict(lambda: defaultdict(int))
         doc_len = len(doc)
+        NLP_TOKENS.inc(doc_len)
+        progress_bar = None
         if cons_mode:
-            progress_bar = tqdm(total=doc_len, desc="Found lemmas...", unit="token", unit_scale=1)
-            for i in range(doc_len):
-                lemma = doc[i].lemma_.strip()
+            from tqdm import tqdm
+
+            # Bar is updated once per chunk of tokens and redrawn no more than every mininterval seconds
+            progress_bar = tqdm(total=doc_len, desc="Found lemmas...", unit="token", unit_scale=1, mininterval=0.5)
+        for start in range(0, doc_len, SimVoc.PROGRESS_CHUNK_SIZE):
+            chunk = doc[start:start + SimVoc.PROGRESS_CHUNK_SIZE]
+            for token in chunk:
+                lemma = token.lemma_.strip()
                 if lemma and "\\" not in lemma:
-                    unsorted_result[doc[i].lemma_] += 1
+                    histogram[token.lemma_][SimVoc.pos_mapping.get(token.pos_, PartSpeech.X).value] += 1
+            if progress_bar is not None:
+                progress_bar.update(len(chunk))
+        if progress_bar is not None:
+            progress_bar.close()
 
-                progress_bar.update(1)
-                time.sleep(0.0001)
+        return {lemma: dict(pos_counts) for lemma, pos_counts in histogram.items()}
 
-            progress_bar.close()
-        else:
-            for i in range(doc_len):
-                lemma = doc[i].lemma_.strip()
-                if lemma and "\\" not in lemma:
-                    unsorted_result[doc[i].lemma_] += 1
+    @staticmethod
+    def create_order_lemmas(source_text: str, cons_mode: bool = False) -> dict:
+        """
+        Order like this:
+        json {
+            'lemma1': 12,
+            'lemma2': 11
+              }
+        """
+        return SimVoc.order_lemmas_from_histogram(SimVoc.create_lemmas_histogram(source_text, cons_mode))
 
-        order_lemmas = dict(sorted(unsorted_result.items(), key=lambda item: item[1], reverse=True))
+    @staticmethod
+    def order_lemmas_from_histogram(histogram: dict) -> dict:
+        return dict(sorted(
+            ((lemma, sum(pos_counts.values())) for lemma, pos_counts in histogram.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        ))
+
+    @staticmethod
+    def dominant_pos(histogram: dict) -> dict:
+        """
+        The most frequent part of speech of each lemma: {lemma: pos}. Tie is resolved by name of part of speech.
+        """
+        return {
+            lemma: max(sorted(pos_counts.items()), key=lambda item: item[1])[0]
+            for lemma, pos_counts in histogram.items() if pos_counts
+        }
 
-        return order_lemmas
+    @staticmethod
+    @stage_timer('merge')
+    def merge_lemmas_histograms(list_histograms: list) -> dict:
+        """
+        Merge results of create_lemmas_histogram for shards of text (sum of frequencies by part of speech).
+        """
+        result = defaultdict(lambda: defaultdict(int))
+        for histogram in list_histograms:
+            for lemma, pos_counts in histogram.items():
+                for pos, frequency in pos_counts.items():
+                    result[lemma][pos] += frequency
+        return {lemma: dict(pos_counts) for lemma, pos_counts in result.items()}
+
+    @staticmethod
+    def split_text(source_text: str, shard_size: int) -> list:
+        """
+        Split text to shards by shard_size words for parallel processing in create_order_lemmas.
+        """
+        words = source_text.split()
+        if not words:
+            return [""]
+        return [" ".join(words[i:i + shard_size]) for i in range(0, len(words), shard_size)]
+
+    @staticmethod
+    def split_text_offsets(source_text: str, shard_size: int) -> list:
+        """
+        Bounds [start, end) of shards by shard_size words in source text, shards are split by whitespace,
+        so each shard can be cleaned apart (clean_text doesn't join words across whitespace).
+        """
+        offsets = []
+        start = end = None
+        for number, word in enumerate(re.finditer(r'\S+', source_text)):
+            if number % shard_size == 0:
+                if start is not None:
+                    offsets.append([start, end])
+                start = word.start()
+            end = word.end()
+        if start is None:
+            return [[0, 0]]
+        offsets.append([start, end])
+        return offsets
+
+    @staticmethod
+    @stage_timer('merge')
+    def merge_order_lemmas(list_order_lemmas: list) -> dict:
+        """
+        Merge results of create_order_lemmas for shards of text in one order (sum of frequencies).
+        """
+        unsorted_result = defaultdict(int)
+        for order_lemmas in list_order_lemmas:
+            for lemma, frequency in order_lemmas.items():
+                unsorted_result[lemma] += frequency
+
+        return dict(sorted(unsorted_result.items(), key=lambda item: item[1], reverse=True))
 
     @staticmethod
     def create_translation_json(main_translate: list, extra_data: list = None, user_inf: list = None):
@@ -266,7 +371,9 @@ class SimVoc:
     #     #     stop=None,
     #     #     timeout=50  # Options: set timeout for request
     #     # )
-    #     client = OpenAI()
+    #     from openai import OpenAI
+    #
+    #     client = OpenAI(api_key=settings.OPENAI_API_KEY)
     #
     #     response = client.chat.completions.create(
     #         model="gpt-3.5-turbo",
@@ -301,6 +408,11 @@ class SimVoc:
     #  or https://github.com/xtekky/gpt4free/blob/main/docs/legacy.md
     @staticmethod
     def strategy_get_translate_g4f(text_to_translate: str, lang_to: str, num_extra_translate: int = 1) -> str:
+        import g4f
+        from googletrans import LANGUAGES
+
+        if lang_to not in LANGUAGES:
+            raise UnsupportedLanguage(f"Language '{lang_to}' is not supported.")
         g4f.debug.logging = True  # Enable debug logging
         g4f.debug.version_check = False  # Disable automatic version checking
         # print(g4f.Provider.Bing.params)  # Print supported args for Bing
@@ -344,24 +456,23 @@ class SimVoc:
             :param lang_to: language which you want to get translate
             :type lang_to: string, limit 2 symbols, for example - 'ru', 'en', 'de'
         """
+        from googletrans import LANGUAGES, Translator
+
+        if lang_to not in LANGUAGES:
+            raise UnsupportedLanguage(f"Language '{lang_to}' is not supported.")
         translator = Translator()
         translated = translator.translate(text_to_translate, dest=lang_to)
 
-        # Handle text by spaCy for POS
-        SimVoc.load_spacy_model()
-
-        # Process the sentence using the loaded model
-        doc = SimVoc.nlp_instance(text_to_translate)
-
-        # Get POS
-        pos_tags = [(token.text, token.pos_) for token in doc]
+        # POS is taken from dictionary of Google (if it is in response), without spaCy.
+        # Lemma keeps POS from its texts (create_lemmas_histogram), it is preferred by translate_lemma_async.
+        all_translations = translated.extra_data.get('all-translations') or [[None]]
 
         return SimVoc.create_translation_json(
             [
                 translated.origin,
                 translated.extra_data['origin_pronunciation'],
                 translated.text,
-                SimVoc.pos_mapping.get(pos_tags[0][1], 'X'),
+                SimVoc.gtrans_pos_mapping.get(all_translations[0][0], PartSpeech.X),
             ],
             [],
             [],
@@ -417,6 +528,7 @@ if __name__ == '__main__':
     translated_dict = json.loads(SimVoc.strategy_get_translate_gtrans("paper", "ru"))  # to JSON object - dict
     print(translated_dict)
 
+    # from random_word import RandomWords
     # r = RandomWords()
     # random_word = r.get_random_word()
     #
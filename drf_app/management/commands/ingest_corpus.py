@@ -0,0 +1,210 @@
+"""
+Bulk ingestion of directory of documents (TXT, PDF) without HTTP API and Celery: one vocabulary per document.
+
+Documents are lemmatized by pool of processes with preloaded spaCy model, results are saved by batches
+(bulk INSERT of vocabularies, source texts and lemmas). Saved documents are written to manifest (JSON lines),
+so interrupted command started again skips them.
+
+Start:
+    python manage.py ingest_corpus /data/books --author admin@example.com --lang-from en --lang-to ru
+"""
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from drf_app.langutils import SimVoc
+from drf_app.models import Lang, Vocabulary, VocabularySource, VocabularyLemma
+from users.models import CustomUser
+
+CORPUS_EXTENSIONS = ('.txt', '.pdf')
+MANIFEST_NAME = '.ingest_manifest.jsonl'
+INGEST_BATCH_SIZE = 1000
+IN_FLIGHT_PER_WORKER = 2  # documents in pool at once for each process
+
+
+def init_worker() -> None:
+    # Model is loaded once per process (it is inherited if parent loaded it before fork)
+    SimVoc.load_spacy_model()
+
+
+def process_document(path: str, shard_size: int) -> dict:
+    """
+    Lemmatize document in process of pool. Work without DB, result is saved by main process.
+    """
+    with open(path, 'rb') as file_obj:
+        source_text = SimVoc.convert_to_txt(file_obj)
+    shards = SimVoc.split_text(SimVoc.clean_text(source_text), shard_size)
+    lemmas_histogram = SimVoc.merge_lemmas_histograms([SimVoc.create_lemmas_histogram(shard) for shard in shards])
+    order_lemmas = SimVoc.order_lemmas_from_histogram(lemmas_histogram)
+    return {
+        'path': path,
+        'source_text': source_text,
+        'order_lemmas': order_lemmas,
+        'lemmas_pos': SimVoc.dominant_pos(lemmas_histogram),
+        'tokens': sum(order_lemmas.values()),
+    }
+
+
+class Command(BaseCommand):
+    help = "Create vocabularies from directory of TXT/PDF documents by pool of processes, with resume by manifest."
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="directory with documents, subdirectories are included")
+        parser.add_argument('--author', required=True, help="email of author of vocabularies")
+        parser.add_argument('--lang-from', default='en', help="short name of language of documents")
+        parser.add_argument('--lang-to', default=settings.DEFAULT_LANG_TO_TRANSLATE,
+                            help="short name of language of translation")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="processes of pool, 0 - process in current process")
+        parser.add_argument('--batch-size', type=int, default=20, help="documents saved in one transaction")
+        parser.add_argument('--manifest', help=f"path of manifest, default <directory>/{MANIFEST_NAME}")
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not directory.is_dir():
+            raise CommandError(f"Directory {directory} does not exist.")
+        try:
+            self.author = CustomUser.objects.get(email=options['author'])
+            self.lang_from = Lang.objects.get(short_name=options['lang_from'])
+            self.lang_to = Lang.objects.get(short_name=options['lang_to'])
+        except (CustomUser.DoesNotExist, Lang.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        self.directory = directory
+        self.manifest = Path(options['manifest']) if options['manifest'] else directory / MANIFEST_NAME
+        done = self.read_manifest()
+        paths = [
+            str(path) for path in sorted(directory.rglob('*'))
+            if path.suffix.lower() in CORPUS_EXTENSIONS and path.is_file() and self.relative(path) not in done
+        ]
+        self.stdout.write(f"Documents to ingest: {len(paths)}, skipped by manifest: {len(done)}")
+        if not paths:
+            return
+
+        self.stats = {'documents': 0, 'failed': 0, 'tokens': 0, 'lemmas': 0, 'created_lemmas': 0}
+        self.start = time.perf_counter()
+        batch = []
+        for result in self.iter_results(paths, options['workers']):
+            if 'error' in result:
+                self.stats['failed'] += 1
+                self.stderr.write(f"{self.relative(Path(result['path']))}: {result['error']}")
+                continue
+            batch.append(result)
+            if len(batch) >= options['batch_size']:
+                self.save_batch(batch)
+                batch = []
+        if batch:
+            self.save_batch(batch)
+
+        seconds = time.perf_counter() - self.start
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {self.stats['documents']} documents ({self.stats['failed']} failed) in {seconds:.1f}s: "
+            f"{self.stats['tokens']} tokens, {self.stats['lemmas']} lemmas ({self.stats['created_lemmas']} new), "
+            f"{self.stats['documents'] / seconds:.2f} documents/sec, {self.stats['tokens'] / seconds:.0f} tokens/sec"
+        ))
+
+    def iter_results(self, paths: list, workers: int):
+        shard_size = settings.NLP_SHARD_SIZE
+        # spaCy model is loaded before pool, so workers started by fork share it
+        init_worker()
+        if workers <= 0:
+            for path in paths:
+                yield self.safe_process(path, shard_size)
+            return
+
+        # Only window of documents is in pool, so memory of results doesn't grow with size of corpus
+        window = workers * IN_FLIGHT_PER_WORKER
+        paths_iter = iter(paths)
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            in_flight = {}
+            while True:
+                for path in islice(paths_iter, window - len(in_flight)):
+                    in_flight[executor.submit(process_document, path, shard_size)] = path
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = in_flight.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        yield {'path': path, 'error': str(e)}
+
+    @staticmethod
+    def safe_process(path: str, shard_size: int) -> dict:
+        try:
+            return process_document(path, shard_size)
+        except Exception as e:
+            return {'path': path, 'error': str(e)}
+
+    def save_batch(self, batch: list) -> None:
+        """
+        Save documents by bulk queries in one transaction, then write them to manifest.
+        Vocabularies are created by bulk_create, so post_save doesn't send them to Celery pipeline.
+        """
+        with transaction.atomic():
+            vocabularies = Vocabulary.objects.bulk_create([
+                Vocabulary(
+                    title=Path(result['path']).stem[:Vocabulary._meta.get_field('title').max_length],
+                    description=f"Ingested from {self.relative(Path(result['path']))}"[:300],
+                    author=self.author,
+                    lang_from=self.lang_from,
+                    lang_to=self.lang_to,
+                    order_lemmas=json.dumps(result['order_lemmas'], ensure_ascii=False),
+                    processing_status=Vocabulary.ProcessingStatus.DONE,
+                    processing_progress=100,
+                )
+                for result in batch
+            ])
+            VocabularySource.objects.bulk_create([
+                VocabularySource(vocabulary=vocabulary, text=result['source_text'])
+                for vocabulary, result in zip(vocabularies, batch)
+            ])
+            for vocabulary, result in zip(vocabularies, batch):
+                upserted = VocabularyLemma.upsert(
+                    vocabulary.id, result['order_lemmas'], result['lemmas_pos'], batch_size=INGEST_BATCH_SIZE
+                )
+                self.stats['created_lemmas'] += upserted['created_lemmas']
+
+        with open(self.manifest, 'a', encoding='utf-8') as manifest:
+            for vocabulary, result in zip(vocabularies, batch):
+                manifest.write(json.dumps({
+                    'file': self.relative(Path(result['path'])),
+                    'vocabulary': str(vocabulary.id),
+                    'tokens': result['tokens'],
+                    'lemmas': len(result['order_lemmas']),
+                }, ensure_ascii=False) + "\n")
+            manifest.flush()
+            os.fsync(manifest.fileno())
+
+        for result in batch:
+            self.stats['documents'] += 1
+            self.stats['tokens'] += result['tokens']
+            self.stats['lemmas'] += len(result['order_lemmas'])
+        seconds = time.perf_counter() - self.start
+        self.stdout.write(
+            f"Saved {self.stats['documents']} documents, {self.stats['tokens']} tokens, "
+            f"{self.stats['tokens'] / seconds:.0f} tokens/sec"
+        )
+
+    def read_manifest(self) -> set:
+        if not self.manifest.exists():
+            return set()
+        done = set()
+        with open(self.manifest, encoding='utf-8') as manifest:
+            for line in manifest:
+                try:
+                    done.add(json.loads(line)['file'])
+                except (ValueError, KeyError):
+                    continue  # line is cut by interruption
+        return done
+
+    def relative(self, path: Path) -> str:
+        return str(path.relative_to(self.directory))
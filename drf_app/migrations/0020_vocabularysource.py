@@ -0,0 +1,41 @@
+# Generated by Django 4.2.5 on 2026-10-19 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_source_text(apps, schema_editor):
+    Vocabulary = apps.get_model('drf_app', 'Vocabulary')
+    VocabularySource = apps.get_model('drf_app', 'VocabularySource')
+    batch = []
+    for voc_id, text in Vocabulary.objects.values_list('id', 'source_text').iterator(chunk_size=100):
+        batch.append(VocabularySource(vocabulary_id=voc_id, text=text))
+        if len(batch) >= 100:
+            VocabularySource.objects.bulk_create(batch)
+            batch = []
+    VocabularySource.objects.bulk_create(batch)
+
+
+def return_source_text(apps, schema_editor):
+    Vocabulary = apps.get_model('drf_app', 'Vocabulary')
+    VocabularySource = apps.get_model('drf_app', 'VocabularySource')
+    for voc_id, text in VocabularySource.objects.values_list('vocabulary_id', 'text').iterator(chunk_size=100):
+        Vocabulary.objects.filter(pk=voc_id).update(source_text=text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0019_alter_lemma_educations_alter_lemma_vocabularies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VocabularySource',
+            fields=[
+                ('vocabulary', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='source', serialize=False, to='drf_app.vocabulary')),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(move_source_text, return_source_text),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-19 10:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0020_vocabularysource'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='vocabulary',
+            name='source_text',
+        ),
+    ]
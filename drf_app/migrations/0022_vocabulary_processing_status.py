@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-19 17:30
+
+from django.db import migrations, models
+
+
+def mark_processed_vocabularies(apps, schema_editor):
+    Vocabulary = apps.get_model('drf_app', 'Vocabulary')
+    Vocabulary.objects.filter(order_lemmas__isnull=False).update(processing_status='DON', processing_progress=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0021_remove_vocabulary_source_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vocabulary',
+            name='processing_progress',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vocabulary',
+            name='processing_status',
+            field=models.CharField(choices=[('PEN', 'Pending'), ('EXT', 'Extracting text'), ('LEM', 'Lemmatizing'), ('ING', 'Ingesting lemmas'), ('TRA', 'Translating lemmas'), ('DON', 'Done'), ('ERR', 'Failed')], default='PEN', max_length=3),
+        ),
+        migrations.RunPython(mark_processed_vocabularies, migrations.RunPython.noop),
+    ]
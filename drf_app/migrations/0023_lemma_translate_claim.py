@@ -0,0 +1,27 @@
+# Generated by Django 4.2.5 on 2026-10-19 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0022_vocabulary_processing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lemma',
+            name='time_translate_claim',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='lemma',
+            name='translate_lang',
+            field=models.CharField(blank=True, default='', max_length=2),
+        ),
+        migrations.AddIndex(
+            model_name='lemma',
+            index=models.Index(fields=['translate_status', 'time_translate_claim'], name='drf_app_lem_transla_53114b_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.5 on 2026-10-19 17:39
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+import drf_app.validators
+import uuid
+
+
+def copy_translations(apps, schema_editor):
+    Lemma = apps.get_model('drf_app', 'Lemma')
+    LemmaTranslation = apps.get_model('drf_app', 'LemmaTranslation')
+    batch = []
+    qs_lemmas = Lemma.objects.exclude(translate_status='ROO').values_list(
+        'id', 'translate', 'pos', 'translate_status', 'translate_lang', 'time_translate_claim'
+    )
+    for lemma_id, translate, pos, translate_status, lang, time_claim in qs_lemmas.iterator(chunk_size=1000):
+        batch.append(LemmaTranslation(
+            lemma_id=lemma_id,
+            lang=lang or 'ru',  # before translate_lang lemmas were translated to default language of API
+            translate=translate,
+            pos=pos,
+            translate_status=translate_status,
+            time_translate_claim=time_claim or timezone.now(),
+        ))
+        if len(batch) >= 1000:
+            LemmaTranslation.objects.bulk_create(batch)
+            batch = []
+    LemmaTranslation.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0023_lemma_translate_claim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LemmaTranslation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('lang', models.CharField(max_length=2)),
+                ('strategy', models.CharField(blank=True, default='', max_length=50)),
+                ('translate', models.JSONField(blank=True, default=None, null=True, validators=[drf_app.validators.validate_json])),
+                ('pos', models.CharField(choices=[('X', 'other'), ('ADJ', 'adjective'), ('ADP', 'adposition'), ('ADV', 'adverb'), ('AUX', 'auxiliary'), ('CCONJ', 'coordinating conjunction'), ('DET', 'determiner'), ('INTJ', 'interjection'), ('NOUN', 'noun'), ('NUM', 'numeral'), ('PART', 'particle'), ('PRON', 'pronoun'), ('PROPN', 'proper noun'), ('PUNCT', 'punctuation'), ('SCONJ', 'subordinating conjunction'), ('SYM', 'symbol'), ('SPACE', 'space'), ('VERB', 'verb')], default='X', max_length=5)),
+                ('translate_status', models.CharField(choices=[('ROO', 'Rookie'), ('PRO', 'In progress'), ('TRA', 'Translated')], default='ROO', max_length=3)),
+                ('time_translate_claim', models.DateTimeField(blank=True, default=None, null=True)),
+                ('time_update', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lemmatranslation',
+            name='lemma',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translations', to='drf_app.lemma'),
+        ),
+        migrations.AddIndex(
+            model_name='lemmatranslation',
+            index=models.Index(fields=['translate_status', 'time_translate_claim'], name='drf_app_lem_transla_9a6d04_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lemmatranslation',
+            constraint=models.UniqueConstraint(fields=('lemma', 'lang'), name='unique_lemma_translation_lang'),
+        ),
+        migrations.RunPython(copy_translations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.5 on 2026-10-19 17:39
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0024_lemmatranslation'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lemma',
+            name='drf_app_lem_transla_53114b_idx',
+        ),
+        migrations.RemoveField(
+            model_name='lemma',
+            name='time_translate_claim',
+        ),
+        migrations.RemoveField(
+            model_name='lemma',
+            name='translate_lang',
+        ),
+    ]
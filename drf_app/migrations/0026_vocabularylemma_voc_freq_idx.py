@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0025_remove_lemma_translate_claim'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vocabularylemma',
+            index=models.Index(fields=['throughVocabulary', '-frequency'], name='vocabularylemma_voc_freq_idx'),
+        ),
+    ]
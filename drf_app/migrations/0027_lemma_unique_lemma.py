@@ -0,0 +1,43 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_lemmas(apps, schema_editor):
+    """
+    Rows of duplicates are moved to the first lemma (if it has no row for the same vocabulary, education
+    or language), then duplicates are deleted with the rest of their rows.
+    """
+    Lemma = apps.get_model('drf_app', 'Lemma')
+    VocabularyLemma = apps.get_model('drf_app', 'VocabularyLemma')
+    EducationLemma = apps.get_model('drf_app', 'EducationLemma')
+    LemmaTranslation = apps.get_model('drf_app', 'LemmaTranslation')
+    duplicates = Lemma.objects.values('lemma').annotate(count=Count('id')).filter(count__gt=1)
+    for item in duplicates.iterator():
+        lemma_id, *duplicates_id = Lemma.objects.filter(lemma=item['lemma']).order_by('id').values_list('id', flat=True)
+        VocabularyLemma.objects.filter(throughLemma__in=duplicates_id).exclude(
+            throughVocabulary__in=VocabularyLemma.objects.filter(throughLemma=lemma_id).values('throughVocabulary')
+        ).update(throughLemma=lemma_id)
+        EducationLemma.objects.filter(throughLemma__in=duplicates_id).exclude(
+            throughEducation__in=EducationLemma.objects.filter(throughLemma=lemma_id).values('throughEducation')
+        ).update(throughLemma=lemma_id)
+        for translation in LemmaTranslation.objects.filter(lemma__in=duplicates_id):
+            if not LemmaTranslation.objects.filter(lemma=lemma_id, lang=translation.lang).exists():
+                LemmaTranslation.objects.filter(pk=translation.pk).update(lemma=lemma_id)
+        Lemma.objects.filter(pk__in=duplicates_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0026_vocabularylemma_voc_freq_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lemmas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lemma',
+            constraint=models.UniqueConstraint(fields=('lemma',), name='unique_lemma'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-19 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_app', '0027_lemma_unique_lemma'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lemmatranslation',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='lemma',
+            name='translate_status',
+            field=models.CharField(choices=[('ROO', 'Rookie'), ('PRO', 'In progress'), ('TRA', 'Translated'), ('ERR', 'Failed')], default='ROO', max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='lemmatranslation',
+            name='translate_status',
+            field=models.CharField(choices=[('ROO', 'Rookie'), ('PRO', 'In progress'), ('TRA', 'Translated'), ('ERR', 'Failed')], default='ROO', max_length=3),
+        ),
+    ]
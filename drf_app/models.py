@@ -1,10 +1,13 @@
 import json
 import uuid
+from collections import defaultdict
 
 from rest_framework.exceptions import ValidationError as DRFValidationError
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q, F
+from django.db.models.functions import Substr
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from drf_app.validators import validate_json
@@ -23,6 +26,18 @@ class Lang(models.Model):
 
 
 class Vocabulary(models.Model):
+    class ProcessingStatus(models.TextChoices):
+        """
+            Stages of pipeline which create order_lemmas for vocabulary (see drf_app.tasks)
+        """
+        PENDING = "PEN", _("Pending")
+        EXTRACTING = "EXT", _("Extracting text")
+        LEMMATIZING = "LEM", _("Lemmatizing")
+        INGESTING = "ING", _("Ingesting lemmas")
+        TRANSLATING = "TRA", _("Translating lemmas")
+        DONE = "DON", _("Done")
+        FAILED = "ERR", _("Failed")
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=150)
     description = models.TextField(max_length=300, blank=True)
@@ -32,7 +47,12 @@ class Vocabulary(models.Model):
     lang_from = models.ForeignKey(Lang, related_name='voc_from', on_delete=models.CASCADE)
     lang_to = models.ForeignKey(Lang, related_name='voc_to', on_delete=models.CASCADE)
     order_lemmas = models.JSONField(null=True, blank=True, validators=[validate_json], default=None)
-    source_text = models.TextField()
+    processing_status = models.CharField(
+        max_length=3,
+        choices=ProcessingStatus.choices,
+        default=ProcessingStatus.PENDING,
+    )
+    processing_progress = models.PositiveSmallIntegerField(default=0)
     author = models.ForeignKey("users.CustomUser", related_name='voc_author', on_delete=models.CASCADE, default=None)
     learners = models.ManyToManyField(
         "users.CustomUser",
@@ -59,10 +79,105 @@ class Vocabulary(models.Model):
 
         return order_lemmas_json
 
+    @staticmethod
+    def refresh_order_lemmas(voc_id) -> None:
+        """
+            Rebuild order_lemmas {lemma: frequency} of vocabulary from its VocabularyLemma rows by one query.
+        """
+        qs_lemmas = VocabularyLemma.objects.filter(throughVocabulary=voc_id).values_list(
+            'throughLemma__lemma', 'frequency'
+        ).order_by('-frequency')
+        Vocabulary.objects.filter(pk=voc_id).update(order_lemmas=json.dumps(dict(qs_lemmas), ensure_ascii=False))
+
+    @staticmethod
+    def set_processing(voc_id, processing_status: str = None, progress: int = None, step: int = None) -> None:
+        """
+            Update processing status and progress (percent) of vocabulary without save signals.
+            Params:
+            *step - add value to current progress, use for parallel stages
+        """
+        fields = {}
+        if processing_status is not None:
+            fields['processing_status'] = processing_status
+        if progress is not None:
+            fields['processing_progress'] = progress
+        elif step is not None:
+            fields['processing_progress'] = F('processing_progress') + step
+        if fields:
+            Vocabulary.objects.filter(pk=voc_id).update(**fields)
+
+    def get_source_text(self) -> str:
+        """
+            Get source text of vocabulary. Text is kept in VocabularySource
+            and is loaded only on demand (one extra query, then cached on instance).
+        """
+        try:
+            return self.source.text
+        except VocabularySource.DoesNotExist:
+            return ""
+
+    def set_source_text(self, text: str) -> None:
+        """
+            Create or replace source text of vocabulary. Vocabulary must be saved before.
+        """
+        self.source, _ = VocabularySource.objects.update_or_create(vocabulary=self, defaults={'text': text})
+
+    def add_learners(self, learners_id: list) -> int:
+        """
+            Add learners by one bulk INSERT, learners of vocabulary are skipped.
+            Return number of added learners.
+        """
+        existing = set(LearnerVocabulary.objects.filter(
+            throughVocabulary=self, throughLearner__in=learners_id
+        ).values_list('throughLearner', flat=True))
+        new_learners = [
+            LearnerVocabulary(throughVocabulary=self, throughLearner_id=learner_id)
+            for learner_id in dict.fromkeys(learners_id) if learner_id not in existing
+        ]
+        LearnerVocabulary.objects.bulk_create(new_learners, batch_size=1000)
+        return len(new_learners)
+
+    def remove_learners(self, learners_id: list) -> int:
+        """
+            Remove learners by one DELETE. Return number of removed learners.
+        """
+        removed, _ = LearnerVocabulary.objects.filter(
+            throughVocabulary=self, throughLearner__in=learners_id
+        ).delete()
+        return removed
+
     def __str__(self):
         return f"({self.title}: {self.id})"
 
 
+class VocabularySource(models.Model):
+    """
+    Raw source text of vocabulary. Stored apart from Vocabulary, so queries
+    by vocabulary's metadata don't read large text.
+    """
+    vocabulary = models.OneToOneField(
+        Vocabulary,
+        primary_key=True,
+        related_name='source',
+        on_delete=models.CASCADE,
+    )
+    text = models.TextField()
+
+    @staticmethod
+    def get_text_slice(voc_id, start: int, end: int) -> str:
+        """
+            Part [start, end) of source text, only this part is read from DB.
+        """
+        if end <= start:
+            return ""
+        return VocabularySource.objects.filter(vocabulary=voc_id).annotate(
+            text_slice=Substr('text', start + 1, end - start),
+        ).values_list('text_slice', flat=True).first() or ""
+
+    def __str__(self):
+        return f"('{self.vocabulary_id}', '{len(self.text)}')"
+
+
 class LearnerVocabulary(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     throughLearner = models.ForeignKey("users.CustomUser", on_delete=models.CASCADE)
@@ -204,6 +319,7 @@ class Lemma(models.Model):
         ROOKIE = "ROO", _("Rookie")
         IN_PROGRESS = "PRO", _("In progress")
         TRANSLATED = "TRA", _("Translated")
+        FAILED = "ERR", _("Failed")
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     lemma = models.CharField(max_length=150)
@@ -227,6 +343,11 @@ class Lemma(models.Model):
         default=TranslateStatus.ROOKIE,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lemma'], name='unique_lemma'),
+        ]
+
     def save(self, *args, **kwargs):
         existing_lemma = Lemma.objects.filter(lemma=self.lemma).exists()
         if not self.pk:  # only create (not update)
@@ -239,12 +360,144 @@ class Lemma(models.Model):
         return self.lemma
 
 
+class LemmaTranslation(models.Model):
+    """
+    Translation of lemma to one language, lemma has no more one translation for each language.
+    Row is created with IN_PROGRESS status when lemma is claimed for translate (see claim).
+    Translation which providers rejected or which was sent again settings.TRANSLATE_MAX_ATTEMPTS times is FAILED.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    lemma = models.ForeignKey(Lemma, related_name='translations', on_delete=models.CASCADE)
+    lang = models.CharField(max_length=2)
+    strategy = models.CharField(max_length=50, blank=True, default='')
+    translate = models.JSONField(null=True, blank=True, validators=[validate_json], default=None)
+    pos = models.CharField(
+        max_length=5,
+        choices=Lemma.Pos.choices,
+        default=Lemma.Pos.X,
+    )
+    translate_status = models.CharField(
+        max_length=3,
+        choices=Lemma.TranslateStatus.choices,
+        default=Lemma.TranslateStatus.ROOKIE,
+    )
+    time_translate_claim = models.DateTimeField(null=True, blank=True, default=None)
+    attempts = models.PositiveSmallIntegerField(default=0)  # times translation was sent again (requeue)
+    time_update = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lemma', 'lang'], name='unique_lemma_translation_lang'),
+        ]
+        indexes = [
+            # For search translations which stuck (see drf_app.tasks.requeue_stuck_translations_async)
+            models.Index(fields=['translate_status', 'time_translate_claim']),
+        ]
+
+    @staticmethod
+    def claim(lemma_id, lang: str) -> bool:
+        """
+            Claim lemma for translate to lang: create translation with IN_PROGRESS status
+            or change ROOKIE -> IN_PROGRESS by one UPDATE.
+            Return True only for one caller, who must send lemma to translate.
+        """
+        time_claim = timezone.now()
+        if LemmaTranslation.objects.filter(
+                lemma=lemma_id,
+                lang=lang,
+                translate_status=Lemma.TranslateStatus.ROOKIE
+        ).update(translate_status=Lemma.TranslateStatus.IN_PROGRESS, time_translate_claim=time_claim):
+            return True
+        try:
+            with transaction.atomic():
+                LemmaTranslation.objects.create(
+                    lemma_id=lemma_id,
+                    lang=lang,
+                    translate_status=Lemma.TranslateStatus.IN_PROGRESS,
+                    time_translate_claim=time_claim,
+                )
+        except IntegrityError:  # translation exists, somebody claimed it before
+            return False
+        return True
+
+    def __str__(self):
+        return f"('{self.lemma_id}', '{self.lang}', '{self.translate_status}')"
+
+
 class VocabularyLemma(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     throughVocabulary = models.ForeignKey(Vocabulary, on_delete=models.CASCADE)
     throughLemma = models.ForeignKey(Lemma, on_delete=models.CASCADE)
     frequency = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Lemmas of vocabulary ordered by frequency (keyset pagination)
+            models.Index(fields=['throughVocabulary', '-frequency'], name='vocabularylemma_voc_freq_idx'),
+        ]
+
+    @staticmethod
+    def upsert(voc_id, frequencies: dict, pos: dict = None, batch_size: int = 1000) -> dict:
+        """
+            Create lemmas which don't exist and set frequencies of lemmas in vocabulary by bulk queries.
+            Repeat with the same data doesn't duplicate rows.
+            Params:
+            *frequencies - {lemma: frequency}
+            *pos - {lemma: part of speech}, is set for new lemmas and lemmas with unknown part of speech (X)
+            Return numbers of created lemmas, created and updated lemmas of vocabulary.
+        """
+        pos = pos or {}
+        result = {'created_lemmas': 0, 'created': 0, 'updated': 0}
+        items = list(frequencies.items())
+        for i in range(0, len(items), batch_size):
+            batch = dict(items[i:i + batch_size])
+            lemmas = {
+                lemma.lemma: lemma for lemma in Lemma.objects.filter(lemma__in=batch).only('id', 'lemma', 'pos')
+            }
+            new_lemmas = [Lemma(lemma=lemma, pos=pos.get(lemma, Lemma.Pos.X)) for lemma in batch if lemma not in lemmas]
+            # Lemma created by parallel upsert after select is skipped, so all new lemmas are selected again
+            Lemma.objects.bulk_create(new_lemmas, batch_size=batch_size, ignore_conflicts=True)
+            new_lemmas_id = {lemma.id for lemma in new_lemmas}
+            new_lemmas = Lemma.objects.filter(
+                lemma__in=[lemma.lemma for lemma in new_lemmas]
+            ).only('id', 'lemma', 'pos')
+            created_lemmas = 0
+            for lemma in new_lemmas:
+                lemmas[lemma.lemma] = lemma
+                created_lemmas += lemma.id in new_lemmas_id
+
+            # One UPDATE for each part of speech, parts of speech are few unlike frequencies
+            update_pos = defaultdict(list)
+            for lemma in lemmas.values():
+                if lemma.pos == Lemma.Pos.X and pos.get(lemma.lemma, Lemma.Pos.X) != Lemma.Pos.X:
+                    update_pos[pos[lemma.lemma]].append(lemma.id)
+            for lemma_pos, lemmas_id in update_pos.items():
+                Lemma.objects.filter(pk__in=lemmas_id).update(pos=lemma_pos)
+
+            voc_lemmas = {
+                item.throughLemma_id: item for item in VocabularyLemma.objects.filter(
+                    throughVocabulary=voc_id, throughLemma__in=[lemma.id for lemma in lemmas.values()]
+                )
+            }
+            create_voc_lemmas = []
+            update_voc_lemmas = []
+            for lemma, frequency in batch.items():
+                voc_lemma = voc_lemmas.get(lemmas[lemma].id)
+                if voc_lemma is None:
+                    create_voc_lemmas.append(
+                        VocabularyLemma(throughVocabulary_id=voc_id, throughLemma_id=lemmas[lemma].id, frequency=frequency)
+                    )
+                elif voc_lemma.frequency != frequency:
+                    voc_lemma.frequency = frequency
+                    update_voc_lemmas.append(voc_lemma)
+            VocabularyLemma.objects.bulk_create(create_voc_lemmas, batch_size=batch_size)
+            VocabularyLemma.objects.bulk_update(update_voc_lemmas, ['frequency'], batch_size=batch_size)
+
+            result['created_lemmas'] += created_lemmas
+            result['created'] += len(create_voc_lemmas)
+            result['updated'] += len(update_voc_lemmas)
+        return result
+
     def __str__(self):
         return f"('{self.throughVocabulary}', '{self.throughLemma}', '{self.frequency}')"
 
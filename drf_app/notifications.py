@@ -0,0 +1,79 @@
+"""
+Notifications about finished work (translation of lemma, processing of vocabulary) by Redis pub/sub.
+Celery tasks publish by sync client, async views wait for message by redis.asyncio without worker thread.
+Message is only a signal: state is read again from DB after it, so lost message costs only waiting until timeout.
+"""
+import asyncio
+import json
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+import logging
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'simcont'
+
+_client = None
+
+
+def translation_channel(lemma_id, lang: str) -> str:
+    return f"{CHANNEL_PREFIX}:translation:{lemma_id}:{lang}"
+
+
+def vocabulary_channel(voc_id) -> str:
+    return f"{CHANNEL_PREFIX}:vocabulary:{voc_id}"
+
+
+def get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.NOTIFY_REDIS_URL, socket_timeout=5)
+    return _client
+
+
+def publish(channel: str, data: dict) -> None:
+    """
+    Publish message to channel. Error of Redis is logged and doesn't fail caller (task has saved result to DB).
+    """
+    try:
+        get_client().publish(channel, json.dumps(data, ensure_ascii=False, default=str))
+    except redis.RedisError as e:
+        logger.warning("Notification to %s is not published: %s", channel, e)
+
+
+class Subscription:
+    """
+    Async subscription to channels:
+        async with Subscription(channel) as subscription:
+            ... check state in DB ...
+            message = await subscription.wait(timeout)
+    Subscribe before check of state, else message published between check and subscribe is lost.
+    """
+    def __init__(self, *channels: str):
+        self.channels = channels
+        self.client = None
+        self.pubsub = None
+
+    async def __aenter__(self):
+        self.client = redis.asyncio.Redis.from_url(settings.NOTIFY_REDIS_URL)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(*self.channels)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+    async def wait(self, timeout: float):
+        """
+        Next message as (channel, data) or None if timeout passed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            message = await self.pubsub.get_message(timeout=remaining)
+            if message is not None and message['type'] == 'message':
+                return message['channel'].decode(), json.loads(message['data'])
+        return None
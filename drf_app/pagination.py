@@ -0,0 +1,137 @@
+"""
+Pagination of API. Size of page is set by client (limit or page_size) up to max_limit of endpoint.
+"""
+import base64
+import json
+import uuid
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def get_page_size(request, query_param: str, default: int, maximum: int) -> int:
+    """
+    Size of page from query param of request, it is limited by maximum.
+    """
+    try:
+        page_size = int(request.query_params[query_param])
+    except (KeyError, ValueError):
+        return default
+    if page_size <= 0:
+        return default
+    return min(page_size, maximum)
+
+
+class SizedLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination which accepts page_size as synonym of limit.
+    """
+    page_size_query_param = 'page_size'
+    max_limit = settings.MAX_PAGE_SIZE
+
+    def get_limit(self, request):
+        if self.page_size_query_param in request.query_params:
+            return get_page_size(request, self.page_size_query_param, self.default_limit, self.max_limit)
+        return super().get_limit(request)
+
+
+# Vocabulary and Education contain full order of lemmas, so their pages are small by default
+class VocabularyPagination(SizedLimitOffsetPagination):
+    default_limit = 5
+    max_limit = 50
+
+
+class LemmaPagination(SizedLimitOffsetPagination):
+    default_limit = 50
+    max_limit = 500
+
+
+class EducationPagination(SizedLimitOffsetPagination):
+    default_limit = 5
+    max_limit = 50
+
+
+class BoardPagination(SizedLimitOffsetPagination):
+    default_limit = 20
+    max_limit = 100
+
+
+class FrequencyKeysetPagination(BasePagination):
+    """
+    Keyset pagination of lemmas ordered by frequency (desc) and id. Queryset must be annotated by frequency.
+    Next page is filtered by (frequency, id) of last lemma, so request of any page costs the same.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = get_page_size(request, self.page_size_query_param, self.page_size, self.max_page_size)
+        queryset = queryset.order_by('-frequency', 'id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            frequency, last_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(frequency__lt=frequency) | Q(frequency=frequency, id__gt=last_id))
+
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_position = (page[-1].frequency, str(page[-1].id)) if self.has_next else None
+        return page
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        try:
+            frequency, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return int(frequency), uuid.UUID(last_id)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position: tuple) -> str:
+        return base64.urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor of page from link next',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of lemmas on page (max {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -1,12 +1,18 @@
 import json
 
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from drf_yasg import openapi
 from rest_framework import serializers
-from .models import Vocabulary, Lemma, Lang, Education, Board, EducationLemma, VocabularyLemma
+from .models import Vocabulary, Lemma, Lang, Education, Board, EducationLemma, VocabularyLemma, VocabularySource, \
+    LemmaTranslation
 
 from users.serializers import LearnerSerializer
 from users.models import CustomUser
 
+# Max number of learners in one request for add/remove
+LEARNERS_BATCH_LIMIT = 5000
+
 
 class OrderLemmasField(serializers.JSONField):
     """
@@ -30,6 +36,36 @@ class OrderLemmasField(serializers.JSONField):
         }
 
 
+class PrimaryKeyListField(serializers.ListField):
+    """
+    List of primary keys of objects from queryset.
+    Unlike PrimaryKeyRelatedField(many=True) all keys are checked by one query, duplicates are dropped.
+    """
+    default_error_messages = {
+        'incorrect_type': 'Incorrect type. Expected pk value, received {data_type}.',
+        'does_not_exist': 'Invalid pk "{pk_value}" - object does not exist.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        pk_field = self.queryset.model._meta.pk
+        pks = {}
+        for item in super().to_internal_value(data):
+            try:
+                pks[pk_field.to_python(item)] = None
+            except (DjangoValidationError, TypeError):
+                self.fail('incorrect_type', data_type=type(item).__name__)
+
+        existing = set(self.queryset.filter(pk__in=pks).values_list('pk', flat=True))
+        for pk in pks:
+            if pk not in existing:
+                self.fail('does_not_exist', pk_value=pk)
+        return list(pks)
+
+
 class VocabularySerializer(serializers.ModelSerializer):
 
     order_lemmas = OrderLemmasField(
@@ -37,28 +73,62 @@ class VocabularySerializer(serializers.ModelSerializer):
         allow_null=True,
     )
     learners = LearnerSerializer(many=True, read_only=True)
-    learners_id = serializers.PrimaryKeyRelatedField(
+    learners_id = PrimaryKeyListField(
         queryset=CustomUser.objects.all(),
         write_only=True,
-        many=True
+        max_length=LEARNERS_BATCH_LIMIT,
     )
     author = serializers.ReadOnlyField(source='author.id', read_only=True)
+    # Source text is kept in VocabularySource, for read it use endpoint vocabulary/<id>/source_text/
+    source_text = serializers.CharField(write_only=True, allow_blank=True)
 
     class Meta:
         model = Vocabulary
         fields = ('id', 'title', 'description', 'is_active', 'time_create', 'time_update',
                   'lang_from', 'lang_to', 'order_lemmas', 'source_text', 'author', 'learners',
-                  'learners_id', 'order_lemmas_updated')
+                  'learners_id', 'order_lemmas_updated', 'processing_status', 'processing_progress')
+        read_only_fields = ('processing_status', 'processing_progress')
 
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         learners = validated_data.pop('learners_id', None)
-        vocabulary = Vocabulary.objects.create(**validated_data)
-        for learner in learners:
-            vocabulary.learners.add(learner.id)
-        vocabulary.save()
+        source_text = validated_data.pop('source_text', '')
+        with transaction.atomic():
+            vocabulary = Vocabulary.objects.create(**validated_data)
+            vocabulary.set_source_text(source_text)
+            if learners:
+                vocabulary.add_learners(learners)
         return vocabulary
 
+    def update(self, instance, validated_data):
+        source_text = validated_data.pop('source_text', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if source_text is not None:
+                instance.set_source_text(source_text)
+        return instance
+
+
+class VocabularyProcessingSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Vocabulary
+        fields = ('id', 'processing_status', 'processing_progress')
+
+
+class VocabularyLearnersSerializer(serializers.Serializer):
+    learners_id = PrimaryKeyListField(
+        queryset=CustomUser.objects.all(),
+        max_length=LEARNERS_BATCH_LIMIT,
+    )
+
+
+class VocabularySourceSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = VocabularySource
+        fields = ('vocabulary', 'text')
+
 
 class VocabularyIdSerializer(serializers.ModelSerializer):
 
@@ -109,11 +179,16 @@ class TranslateField(serializers.JSONField):
 
 
 class TranslateLemmaSerializer(serializers.ModelSerializer):
+    """
+    Translation of lemma to exactly language (lang)
+    """
+    id = serializers.ReadOnlyField(source='lemma.id')
+    lemma = serializers.ReadOnlyField(source='lemma.lemma')
     translate = TranslateField()
 
     class Meta:
-        model = Lemma
-        fields = ('id', 'lemma',  'pos', 'translate', 'translate_status')
+        model = LemmaTranslation
+        fields = ('id', 'lemma', 'lang', 'pos', 'translate', 'translate_status')
 
 
 class LanguageSerializer(serializers.ModelSerializer):
@@ -125,7 +200,7 @@ class LanguageSerializer(serializers.ModelSerializer):
 
 class EducationSerializer(serializers.ModelSerializer):
     list_lemmas = serializers.SerializerMethodField()
-    learner = serializers.ReadOnlyField(source='learner.id', read_only=True)
+    learner = serializers.ReadOnlyField(source='learner_id', read_only=True)
 
     class Meta:
         model = Education
@@ -142,7 +217,11 @@ class EducationSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
     def get_list_lemmas(self, obj):
-        return Education.get_list_lemmas_from_voc(obj)
+        # Lemmas of vocabulary are prefetched by EducationViewSet ordered by frequency
+        frequency_lemmas = getattr(obj.vocabulary, 'frequency_lemmas', None)
+        if frequency_lemmas is None:
+            return Education.get_list_lemmas_from_voc(obj)
+        return [item.throughLemma.lemma for item in frequency_lemmas]
 
 
 class EducationIdSerializer(serializers.ModelSerializer):
@@ -193,20 +272,28 @@ class LemmaSerializer(serializers.ModelSerializer):
         vocabularies = validated_data.pop('vocabularies_id', None)
         educations = validated_data.pop('educations_id', None)
         lemma = Lemma.objects.create(**validated_data)
+        # New lemma has no relations, so only adds are needed
         if vocabularies:
-            for voc in vocabularies:
-                lemma.vocabularies.add(voc.id)
-        else:
-            lemma.vocabularies.set([])
+            lemma.vocabularies.add(*vocabularies)
         if educations:
-            for edu in educations:
-                lemma.educations.add(edu.id)
-        else:
-            lemma.educations.set([])
-        lemma.save()
+            lemma.educations.add(*educations)
         return lemma
 
 
+class FrequencyLemmaSerializer(serializers.ModelSerializer):
+    """
+    Lemma of vocabulary with its frequency and translation to requested language
+    (queryset is annotated by frequency, lang_translate and lang_translate_status from LemmaTranslation).
+    """
+    frequency = serializers.IntegerField(read_only=True)
+    translate = TranslateField(source='lang_translate', read_only=True)
+    translate_status = serializers.CharField(source='lang_translate_status', read_only=True)
+
+    class Meta:
+        model = Lemma
+        fields = ('id', 'lemma', 'pos', 'frequency', 'translate', 'translate_status')
+
+
 class EducationLemmaSerializer(serializers.ModelSerializer):
 
     class Meta:
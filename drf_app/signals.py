@@ -1,12 +1,12 @@
 import logging
 
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.dispatch import Signal
 
-from simcont import settings
 from .models import Vocabulary, Education, Board
-from .tasks import create_order_lemmas_async, translate_lemma_async
+from .tasks import order_lemmas_pipeline, translate_lemma_dispatch
 
 logger = logging.getLogger(__name__)
 
@@ -17,28 +17,25 @@ translate_lemma_signal = Signal()
 def translate_lemma_get(sender, **kwargs):
     lemma = kwargs['lemma']
     lang_to = kwargs['lang_to']
-    # Task for Celery
-    translate_lemma_async.apply_async(
-        args=[lemma.pk, settings.DEFAULT_STRATEGY_TRANSLATE, lang_to],
-        countdown=0
-    )
+    # Task for Celery, only one of concurrent requests sends it
+    translate_lemma_dispatch(lemma.pk, lang_to)
 
 
 @receiver(post_save, sender=Vocabulary)
 def order_lemmas_create(sender, instance, created, **kwargs):
     if created:
-        logger.info(f'Send source_txt to Celery for create order_lemmas for vocabulary: {instance.pk}')
-        create_order_lemmas_async.apply_async(args=[instance.pk], countdown=1)
-        instance.save()
+        logger.info('Send source_txt to Celery for create order_lemmas for vocabulary: %s', instance.pk)
+        # Worker gets vocabulary (and its source text) only after commit of transaction which creates them
+        voc_id = instance.pk
+        transaction.on_commit(lambda: order_lemmas_pipeline(voc_id).apply_async())
     return None
 
 
 @receiver(post_save, sender=Education)
 def board_create(sender, instance, created, **kwargs):
     if created:
-        logger.info(f'Create Board for Education: {instance.pk}')
-        instance.save()
-        board = Board.objects.create(education=instance)
+        logger.info('Create Board for Education: %s', instance.pk)
+        board = Board(education=instance)
         board.update_set_lemmas()
         board.save()
 
@@ -1,90 +1,317 @@
 import json
-from typing import Callable
+from datetime import timedelta
 
-from celery import shared_task
-from celery.exceptions import SoftTimeLimitExceeded
-from django.db import transaction
-from django.core.exceptions import ObjectDoesNotExist
+from celery import shared_task, Task, Signature, chain, chord
+from celery.exceptions import SoftTimeLimitExceeded, Ignore
+from django.conf import settings
+from django.db import transaction, DatabaseError
+from django.db.models import F
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.utils import timezone
 
 
+from simcont.prometheus import stage_timer, TRANSLATIONS
+from . import notifications
 from .langutils import SimVoc
-from .models import Vocabulary, Lemma
+from .translation import TranslationError, UnsupportedInput, translate_with_fallback, parse_translation
+from .models import Lang, Vocabulary, VocabularySource, Lemma, VocabularyLemma, LemmaTranslation
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Progress (percent) of vocabulary after stages of order_lemmas pipeline
+PROGRESS_EXTRACTED = 10
+PROGRESS_CLEANED = 20
+PROGRESS_MERGED = 80
+PROGRESS_INGESTED = 95
 
-@shared_task
-def create_order_lemmas_async(voc_id) -> None:
-    try:
-        vocabulary = Vocabulary.objects.get(pk=voc_id)
-        if not vocabulary:
-            logger.info(f"Vocabulary with id {voc_id} does not exist.")
-            return None
-
-        with transaction.atomic():
-            order_lemmas_dict = SimVoc.create_order_lemmas(vocabulary.source_text)
-            order_lemmas_json = json.dumps(order_lemmas_dict, ensure_ascii=False)
-            vocabulary.order_lemmas = order_lemmas_json
-            vocabulary.save()
-
-            for key, value in order_lemmas_dict.items():
-                if not Lemma.objects.filter(lemma=key).exists():
-                    new_lemma = Lemma.objects.create(lemma=key)
-                    new_lemma.vocabularies.add(vocabulary, through_defaults={"frequency": value})
-                    # new_lemma.save()
-                else:
-                    cur_lemma = Lemma.objects.filter(lemma=key)[0]
-                    cur_lemma.vocabularies.add(vocabulary, through_defaults={"frequency": value})
-                    # cur_lemma.save()
-
-            logger.info(f"Finished process of create order_lemmas for {voc_id}")
+INGEST_BATCH_SIZE = 1000
 
-    except ObjectDoesNotExist:
-        logger.error(f"Vocabulary with id {voc_id} does not exist.")
-    except ValueError as e:
-        logger.error(f"Error converting {voc_id} to UUID: {e}")
-    except SoftTimeLimitExceeded:
-        logger.error("Task time limit exceeded.")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
+
+class OrderLemmasTask(Task):
+    """
+    Base class for stages of order_lemmas pipeline.
+    Stage must get voc_id as keyword argument, if stage failed (after all retries) vocabulary marked as FAILED.
+    Stages are idempotent, so message is acknowledged after execution and is delivered again if worker lost.
+    """
+    acks_late = True
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        voc_id = kwargs.get('voc_id')
+        logger.error("Stage %s failed for vocabulary %s: %s", self.name, voc_id, exc)
+        if voc_id is not None:
+            Vocabulary.set_processing(voc_id, processing_status=Vocabulary.ProcessingStatus.FAILED)
+            notify_vocabulary(voc_id, Vocabulary.ProcessingStatus.FAILED)
+
+
+def notify_vocabulary(voc_id, processing_status: str) -> None:
+    """
+    Notify waiting clients that processing of vocabulary is finished, after commit of current transaction.
+    """
+    transaction.on_commit(lambda: notifications.publish(
+        notifications.vocabulary_channel(voc_id), {'id': str(voc_id), 'processing_status': processing_status}
+    ))
+
+
+def order_lemmas_pipeline(voc_id) -> Signature:
+    """
+    Pipeline for create order_lemmas of vocabulary:
+        extract -> clean -> lemmatize shards (chord) -> merge -> ingest -> translate (optional)
+    Stages get only voc_id (and bounds of shard), source text is read from VocabularySource by stage itself,
+    so text doesn't go through broker.
+    Use .apply_async() for start in Celery or .apply() for start in current process.
+    """
+    voc_id = str(voc_id)
+    stages = [
+        extract_source_text_async.si(voc_id=voc_id),
+        clean_source_text_async.si(voc_id=voc_id),
+        ingest_order_lemmas_async.s(voc_id=voc_id),
+    ]
+    if settings.TRANSLATE_AFTER_INGEST:
+        stages.append(translate_vocabulary_lemmas_async.si(voc_id=voc_id))
+    return chain(*stages)
+
+
+@shared_task(bind=True, base=OrderLemmasTask, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=3)
+def extract_source_text_async(self, voc_id) -> None:
+    if not Vocabulary.objects.filter(pk=voc_id).exists():
+        logger.error("Vocabulary with id %s does not exist.", voc_id)
+        raise Ignore()
+
+    Vocabulary.set_processing(
+        voc_id,
+        processing_status=Vocabulary.ProcessingStatus.EXTRACTING,
+        progress=PROGRESS_EXTRACTED
+    )
     return None
 
 
-@shared_task
-def translate_lemma_async(lemma_id, strategy, lang_to) -> None:
-    try:
-        lemma = Lemma.objects.get(pk=lemma_id)
-        if not lemma:
-            logger.info(f"Lemma with id {lemma_id} does not exist.")
-            return None
+@shared_task(bind=True, base=OrderLemmasTask, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=3)
+def clean_source_text_async(self, voc_id):
+    """
+    Split source text to shards and replace itself by chord: lemmatize shards of text -> merge results.
+    Shards are sent as bounds in source text, each shard is read and cleaned by lemmatize stage.
+    """
+    source_text = VocabularySource.objects.filter(vocabulary=voc_id).values_list('text', flat=True).first() or ""
+    offsets = SimVoc.split_text_offsets(source_text, settings.NLP_SHARD_SIZE)
+    Vocabulary.set_processing(
+        voc_id,
+        processing_status=Vocabulary.ProcessingStatus.LEMMATIZING,
+        progress=PROGRESS_CLEANED
+    )
+    step = (PROGRESS_MERGED - PROGRESS_CLEANED) // len(offsets)
+    return self.replace(chord(
+        [lemmatize_shard_async.s(start, end, voc_id=voc_id, step=step) for start, end in offsets],
+        merge_order_lemmas_async.s(voc_id=voc_id),
+    ))
+
+
+@shared_task(bind=True, base=OrderLemmasTask, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=2)
+def lemmatize_shard_async(self, start, end, voc_id, step=0) -> dict:
+    shard = SimVoc.clean_text(VocabularySource.get_text_slice(voc_id, start, end))
+    lemmas_histogram = SimVoc.create_lemmas_histogram(shard)
+    Vocabulary.set_processing(voc_id, step=step)
+    return lemmas_histogram
+
+
+@shared_task(bind=True, base=OrderLemmasTask, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=3)
+def merge_order_lemmas_async(self, list_histograms, voc_id) -> list:
+    """
+    Merge histograms (lemma, part of speech) of shards. Return [order_lemmas, the most frequent pos of lemmas].
+    """
+    lemmas_histogram = SimVoc.merge_lemmas_histograms(list_histograms)
+    Vocabulary.set_processing(
+        voc_id,
+        processing_status=Vocabulary.ProcessingStatus.INGESTING,
+        progress=PROGRESS_MERGED
+    )
+    return [SimVoc.order_lemmas_from_histogram(lemmas_histogram), SimVoc.dominant_pos(lemmas_histogram)]
+
+
+@shared_task(bind=True, base=OrderLemmasTask, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=5)
+def ingest_order_lemmas_async(self, merged_lemmas, voc_id) -> None:
+    """
+    Save order_lemmas to vocabulary and create Lemma/VocabularyLemma by bulk queries, part of speech
+    from text is set for new lemmas and lemmas with unknown part of speech.
+    Stage is idempotent: repeat of stage updates frequencies and doesn't duplicate rows.
+    """
+    order_lemmas_dict, lemmas_pos = merged_lemmas
+    with stage_timer('ingest'), transaction.atomic():
+        if not Vocabulary.objects.filter(pk=voc_id).update(
+                order_lemmas=json.dumps(order_lemmas_dict, ensure_ascii=False)
+        ):
+            logger.error("Vocabulary with id %s does not exist.", voc_id)
+            raise Ignore()
 
-        with transaction.atomic():
+        VocabularyLemma.upsert(voc_id, order_lemmas_dict, lemmas_pos, batch_size=INGEST_BATCH_SIZE)
 
-            strategy_function: Callable = getattr(SimVoc, f"strategy_{strategy}", None)
+        if settings.TRANSLATE_AFTER_INGEST:
+            Vocabulary.set_processing(voc_id, progress=PROGRESS_INGESTED)
+        else:
+            Vocabulary.set_processing(voc_id, processing_status=Vocabulary.ProcessingStatus.DONE, progress=100)
+            notify_vocabulary(voc_id, Vocabulary.ProcessingStatus.DONE)
 
-            if strategy_function is not None and callable(strategy_function):
-                lemma.translate_status = Lemma.TranslateStatus.IN_PROGRESS
-                lemma.save()
+    logger.info("Finished process of create order_lemmas for %s", voc_id)
+    return None
+
+
+@shared_task(bind=True, base=OrderLemmasTask)
+def translate_vocabulary_lemmas_async(self, voc_id) -> None:
+    """
+    Send to translate the most frequent lemmas of vocabulary (no more settings.TRANSLATE_BATCH_LIMIT).
+    """
+    Vocabulary.set_processing(voc_id, processing_status=Vocabulary.ProcessingStatus.TRANSLATING)
+    vocabulary = Vocabulary.objects.select_related('lang_to').get(pk=voc_id)
+    lemmas_id = VocabularyLemma.objects.filter(
+        throughVocabulary=voc_id,
+    ).exclude(
+        throughLemma__translations__lang=vocabulary.lang_to.short_name,
+    ).order_by('-frequency').values_list('throughLemma', flat=True)[:settings.TRANSLATE_BATCH_LIMIT]
+
+    for lemma_id in lemmas_id:
+        translate_lemma_dispatch(lemma_id, vocabulary.lang_to.short_name, known_lang=True)
+
+    Vocabulary.set_processing(voc_id, processing_status=Vocabulary.ProcessingStatus.DONE, progress=100)
+    notify_vocabulary(voc_id, Vocabulary.ProcessingStatus.DONE)
+    return None
 
-                lemma_translated = strategy_function(lemma.lemma, lang_to)
-                lemma.translate = lemma_translated
 
-                _pos = json.loads(lemma_translated).get("main_translate", None)[3]
-                lemma.pos = _pos or lemma.pos
+def translate_lemma_dispatch(lemma_id, lang_to: str, known_lang: bool = False) -> bool:
+    """
+    Send lemma to translate to lang_to at most once: only caller who claimed translation sends task.
+    Language must be one of Lang, unknown language isn't claimed (known_lang - caller took it from Lang).
+    """
+    if not known_lang and not Lang.objects.filter(short_name=lang_to).exists():
+        logger.warning("Lemma %s isn't sent to translate to unknown language %s.", lemma_id, lang_to)
+        return False
+    if not LemmaTranslation.claim(lemma_id, lang_to):
+        return False
 
-                lemma.translate_status = Lemma.TranslateStatus.TRANSLATED
+    transaction.on_commit(lambda: translate_lemma_async.apply_async(
+        args=[str(lemma_id), settings.DEFAULT_STRATEGY_TRANSLATE, lang_to],
+        countdown=0
+    ))
+    return True
 
-                lemma.save()
-            logger.info(f"Finished process of get translate for lemma: {lemma.lemma}, "
-                        f"with strategy: {strategy}")
 
+@shared_task
+def translate_lemma_async(lemma_id, strategy, lang_to) -> None:
+    """
+    Translate lemma claimed for lang_to (translation IN_PROGRESS). Request to provider is made out of DB transaction.
+    Strategy is tried first, then other strategies of fallback chain (see drf_app.translation).
+    If translate failed, translation stays IN_PROGRESS and will be sent again by requeue_stuck_translations_async.
+    """
+    try:
+        translation = LemmaTranslation.objects.select_related('lemma').get(lemma=lemma_id, lang=lang_to)
     except ObjectDoesNotExist:
-        logger.error(f"Lemma with id {lemma_id} does not exist.")
-    except ValueError as e:
-        logger.error(f"Error converting {lemma_id} to UUID: {e}")
+        logger.error("Translation of lemma %s to %s does not exist.", lemma_id, lang_to)
+        return None
+    except ValidationError as e:
+        logger.error("Error converting %s to UUID: %s", lemma_id, e)
+        return None
+
+    if translation.translate_status != Lemma.TranslateStatus.IN_PROGRESS:
+        logger.info("Lemma %s is not claimed for translate to %s, status: %s",
+                    lemma_id, lang_to, translation.translate_status)
+        return None
+
+    lemma = translation.lemma
+    try:
+        strategy, lemma_translated = translate_with_fallback(lemma.lemma, lang_to, strategy)
     except SoftTimeLimitExceeded:
         logger.error("Task time limit exceeded.")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
+        TRANSLATIONS.labels(strategy, 'timeout').inc()
+        return None
+    except UnsupportedInput as e:
+        # All providers rejected lemma or language, sending again doesn't help
+        logger.error("Translate of lemma %s to %s is rejected: %s", lemma.lemma, lang_to, e)
+        fail_translations([(translation.pk, lemma.pk, lang_to)])
+        return None
+    except TranslationError as e:
+        # Translation stays IN_PROGRESS and will be sent again by requeue_stuck_translations_async
+        logger.error("Translate of lemma %s to %s failed: %s", lemma.lemma, lang_to, e)
+        return None
+    # Part of speech from texts of lemma (ingestion) is preferred, provider's one is used for unknown
+    _pos = lemma.pos if lemma.pos != Lemma.Pos.X else parse_translation(lemma_translated)[3]
+    if _pos not in Lemma.Pos.values:
+        _pos = Lemma.Pos.X
+
+    with transaction.atomic():
+        LemmaTranslation.objects.filter(pk=translation.pk, translate_status=Lemma.TranslateStatus.IN_PROGRESS).update(
+            strategy=strategy,
+            translate=lemma_translated,
+            pos=_pos,
+            translate_status=Lemma.TranslateStatus.TRANSLATED,
+            time_update=timezone.now(),
+        )
+        # Lemma keeps translation to default language for clients of API which don't use lang_to
+        lemma_fields = {'pos': _pos}
+        if lang_to == settings.DEFAULT_LANG_TO_TRANSLATE:
+            lemma_fields.update(translate=lemma_translated, translate_status=Lemma.TranslateStatus.TRANSLATED)
+        Lemma.objects.filter(pk=lemma.pk).update(**lemma_fields)
+    TRANSLATIONS.labels(strategy, 'translated').inc()
+    notifications.publish(
+        notifications.translation_channel(lemma.pk, lang_to),
+        {'id': str(lemma.pk), 'lang': lang_to, 'translate_status': Lemma.TranslateStatus.TRANSLATED},
+    )
+
+    logger.info("Finished process of get translate for lemma: %s, with strategy: %s", lemma.lemma, strategy)
     return None
+
+
+def fail_translations(translations) -> int:
+    """
+    Set FAILED status of translations [(id, lemma_id, lang)] which are IN_PROGRESS and notify waiting clients.
+    Return number of failed translations.
+    """
+    failed = 0
+    for translation_id, lemma_id, lang_to in translations:
+        if LemmaTranslation.objects.filter(
+                pk=translation_id, translate_status=Lemma.TranslateStatus.IN_PROGRESS
+        ).update(translate_status=Lemma.TranslateStatus.FAILED, time_update=timezone.now()):
+            notifications.publish(
+                notifications.translation_channel(lemma_id, lang_to),
+                {'id': str(lemma_id), 'lang': lang_to, 'translate_status': Lemma.TranslateStatus.FAILED},
+            )
+            failed += 1
+    return failed
+
+
+@shared_task
+def requeue_stuck_translations_async() -> None:
+    """
+    Periodic task (Celery beat): send again translations which are IN_PROGRESS longer than
+    settings.TRANSLATE_CLAIM_TIMEOUT. Translation which was sent again settings.TRANSLATE_MAX_ATTEMPTS times
+    is FAILED.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.TRANSLATE_CLAIM_TIMEOUT)
+    qs_stuck = LemmaTranslation.objects.filter(
+        translate_status=Lemma.TranslateStatus.IN_PROGRESS,
+        time_translate_claim__lt=deadline,
+    )
+    failed = fail_translations(
+        qs_stuck.filter(attempts__gte=settings.TRANSLATE_MAX_ATTEMPTS).values_list(
+            'id', 'lemma', 'lang'
+        )[:settings.TRANSLATE_BATCH_LIMIT]
+    )
+    if failed:
+        logger.warning("Translations failed after %s attempts: %s", settings.TRANSLATE_MAX_ATTEMPTS, failed)
+
+    requeued = 0
+    for translation_id, lemma_id, lang_to, time_claim in qs_stuck.filter(
+            attempts__lt=settings.TRANSLATE_MAX_ATTEMPTS
+    ).values_list('id', 'lemma', 'lang', 'time_translate_claim')[:settings.TRANSLATE_BATCH_LIMIT]:
+        # Claim again only if nobody did it before
+        if LemmaTranslation.objects.filter(pk=translation_id, time_translate_claim=time_claim).update(
+                time_translate_claim=timezone.now(), attempts=F('attempts') + 1
+        ):
+            translate_lemma_async.apply_async(
+                args=[str(lemma_id), settings.DEFAULT_STRATEGY_TRANSLATE, lang_to],
+                countdown=0
+            )
+            requeued += 1
+
+    if requeued:
+        logger.info("Translations sent again to translate: %s", requeued)
+    return None
+
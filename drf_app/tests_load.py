@@ -0,0 +1,263 @@
+import json
+import os
+import statistics
+import time
+import unittest
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from drf_app.models import Lang, Vocabulary, VocabularySource, LearnerVocabulary, Lemma, VocabularyLemma, \
+    Education, EducationLemma, Board
+from users.models import CustomUser
+
+import logging
+
+if 'DJANGO_SETTINGS_MODULE' in os.environ:
+    # if Django start
+    from django.conf import settings
+else:
+    # else console start
+    import logging.config
+    from simcont import settings
+    logging.config.dictConfig(settings.LOGGING)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(settings.LOGGING_LEVEL)
+
+# Volume of synthetic data
+NUM_USERS = 2000
+NUM_LEARNERS_VOC = 200  # learners of big vocabulary
+NUM_LEMMAS = 20000  # lemmas in big vocabulary
+NUM_VOCABULARIES = 50  # small vocabularies of other authors
+NUM_EDUCATIONS = 10
+BATCH_SIZE = 1000
+
+# Requests for measure of latency for each endpoint
+NUM_REQUESTS = 10
+
+# Budgets for each endpoint: (max number of SQL queries for request, max p95 latency in ms)
+BUDGETS = {
+    'vocabulary-list': (10, 5000),
+    'vocabulary-detail': (7, 1500),
+    'vocabulary-processing': (2, 200),
+    'vocabulary-lemmas': (3, 1000),
+    'lemma-list': (6, 500),
+    'lemma-detail': (5, 300),
+    'education-list': (5, 5000),  # lemmas of vocabularies are prefetched, doesn't depend on number of educations
+    'education-detail': (6, 1500),
+    'board-list': (3, 300),
+    'board-detail': (5, 300),
+    'board-update-set-lemmas': (11, 1500),
+    'vocabulary-export': (4, 5000),
+    'vocabulary-import': (120, 10000),  # SQLite splits bulk INSERT to small batches
+}
+# Latency budgets are multiplied by this factor on slow machines (CI), for example LOAD_LATENCY_FACTOR=3
+LATENCY_FACTOR = float(os.environ.get('LOAD_LATENCY_FACTOR', 1))
+
+NUM_IMPORT_LEMMAS = 10000  # lemmas in imported frequency list
+
+
+class Factory:
+    """
+    Create synthetic data by bulk queries (without signals of models)
+    """
+    @staticmethod
+    def users(count: int, prefix: str = 'learner') -> list:
+        password = make_password('testpassword')
+        return CustomUser.objects.bulk_create(
+            [CustomUser(email=f'{prefix}{i}@example.com', password=password, is_active=True) for i in range(count)],
+            batch_size=BATCH_SIZE,
+        )
+
+    @staticmethod
+    def vocabulary(author, lang_from, lang_to, learners: list, num_lemmas: int, title: str = 'Vocabulary'):
+        lemmas = Lemma.objects.bulk_create(
+            [Lemma(lemma=f'{title.lower()}lemma{i}') for i in range(num_lemmas)],
+            batch_size=BATCH_SIZE,
+        )
+        order_lemmas = {lemma.lemma: num_lemmas - i for i, lemma in enumerate(lemmas)}
+        vocabulary = Vocabulary.objects.bulk_create([Vocabulary(
+            title=title,
+            lang_from=lang_from,
+            lang_to=lang_to,
+            author=author,
+            order_lemmas=json.dumps(order_lemmas),
+            processing_status=Vocabulary.ProcessingStatus.DONE,
+            processing_progress=100,
+        )])[0]
+        VocabularySource.objects.create(vocabulary=vocabulary, text=" ".join(order_lemmas.keys()))
+        VocabularyLemma.objects.bulk_create(
+            [VocabularyLemma(throughVocabulary=vocabulary, throughLemma=lemma, frequency=order_lemmas[lemma.lemma])
+             for lemma in lemmas],
+            batch_size=BATCH_SIZE,
+        )
+        LearnerVocabulary.objects.bulk_create(
+            [LearnerVocabulary(throughLearner=learner, throughVocabulary=vocabulary) for learner in learners],
+            batch_size=BATCH_SIZE,
+        )
+        return vocabulary, lemmas
+
+    @staticmethod
+    def educations(learner, vocabulary, lemmas: list, count: int) -> list:
+        educations = Education.objects.bulk_create(
+            [Education(learner=learner, vocabulary=vocabulary, limit_lemmas_item=2, limit_lemmas_period=7)
+             for _ in range(count)]
+        )
+        education_lemmas = []
+        boards = []
+        for education in educations:
+            study_lemmas = lemmas[:education.limit_lemmas_item * education.limit_lemmas_period]
+            education_lemmas += [EducationLemma(throughEducation=education, throughLemma=lemma)
+                                 for lemma in study_lemmas]
+            set_lemmas = {
+                day: [str(lemma.id) for lemma in study_lemmas[(day - 1) * 2:day * 2]] for day in range(1, 8)
+            }
+            boards.append(Board(education=education, set_lemmas=json.dumps(set_lemmas)))
+        EducationLemma.objects.bulk_create(education_lemmas, batch_size=BATCH_SIZE)
+        Board.objects.bulk_create(boards)
+        return educations
+
+
+@tag('load')
+class LoadBudgetTests(APITestCase):
+    """
+    Check budgets of SQL queries and latency of API endpoints on big synthetic data.
+    Start only these tests: python3 manage.py test --tag load
+    """
+    @classmethod
+    def setUpTestData(cls):
+        logger.info(f"***** Create test data for {cls.__name__} *****")
+        start = time.perf_counter()
+        cls.lang_from = Lang.objects.create(name='English', short_name='en')
+        cls.lang_to = Lang.objects.create(name='Russian', short_name='ru')
+
+        cls.user = CustomUser.objects.create_user('teacher@example.com', 'testpassword', is_active=True)
+        learners = Factory.users(NUM_USERS)
+
+        cls.vocabulary, cls.lemmas = Factory.vocabulary(
+            cls.user, cls.lang_from, cls.lang_to, [cls.user] + learners[:NUM_LEARNERS_VOC], NUM_LEMMAS
+        )
+        for i in range(NUM_VOCABULARIES):
+            Factory.vocabulary(learners[i], cls.lang_from, cls.lang_to, [cls.user], 20, title=f'Small{i}')
+
+        cls.educations = Factory.educations(cls.user, cls.vocabulary, cls.lemmas, NUM_EDUCATIONS)
+        cls.board = Board.objects.filter(education=cls.educations[0]).first()
+        logger.info(f"Test data created in {time.perf_counter() - start:.1f} sec")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def measure(self, url: str) -> tuple:
+        """
+        Request url NUM_REQUESTS times, return (max number of queries, p50 ms, p95 ms)
+        """
+        latencies = []
+        num_queries = 0
+        for _ in range(NUM_REQUESTS):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.client.get(url)
+                latencies.append((time.perf_counter() - start) * 1000)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, msg=url)
+            num_queries = max(num_queries, len(queries))
+
+        p50 = statistics.median(latencies)
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        return num_queries, p50, p95
+
+    def assert_budget(self, name: str, url: str):
+        num_queries, p50, p95 = self.measure(url)
+        max_queries, max_p95 = BUDGETS[name]
+        logger.info(f"{name}: {num_queries} queries, p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+        self.assertLessEqual(num_queries, max_queries, msg=f"{name}: budget of SQL queries exceeded")
+        self.assertLessEqual(p95, max_p95 * LATENCY_FACTOR, msg=f"{name}: budget of p95 latency exceeded")
+
+    def test_vocabulary_list(self):
+        self.assert_budget('vocabulary-list', reverse('vocabulary-list'))
+
+    def test_vocabulary_detail(self):
+        self.assert_budget('vocabulary-detail', reverse('vocabulary-detail', args=[str(self.vocabulary.id)]))
+
+    def test_vocabulary_processing(self):
+        self.assert_budget('vocabulary-processing', reverse('vocabulary-processing', args=[str(self.vocabulary.id)]))
+
+    def test_vocabulary_lemmas(self):
+        url = reverse('vocabulary-lemmas', args=[str(self.vocabulary.id)])
+        self.assert_budget('vocabulary-lemmas', f'{url}?page_size=1000')
+        # Page deep in vocabulary costs the same as the first one
+        response = self.client.get(url, {'page_size': 1000})
+        for _ in range(5):
+            response = self.client.get(response.data['next'])
+        self.assert_budget('vocabulary-lemmas', response.data['next'])
+
+    def test_lemma_list(self):
+        self.assert_budget('lemma-list', reverse('lemma-list'))
+
+    def test_lemma_detail(self):
+        self.assert_budget('lemma-detail', reverse('lemma-detail', args=[str(self.lemmas[0].id)]))
+
+    def test_education_list(self):
+        self.assert_budget('education-list', reverse('education-list'))
+
+    def test_education_detail(self):
+        self.assert_budget('education-detail', reverse('education-detail', args=[str(self.educations[0].id)]))
+
+    def test_board_list(self):
+        self.assert_budget('board-list', reverse('board-list'))
+
+    def test_board_detail(self):
+        self.assert_budget('board-detail', reverse('board-detail', args=[str(self.board.id)]))
+
+    def test_board_update_set_lemmas(self):
+        self.assert_budget('board-update-set-lemmas', reverse('board-update-set-lemmas', args=[str(self.board.id)]))
+
+    def test_vocabulary_export(self):
+        url = reverse('vocabulary-export', args=[str(self.vocabulary.id)])
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.client.get(url)
+            num_lines = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            latency = (time.perf_counter() - start) * 1000
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(num_lines, NUM_LEMMAS + 1)
+
+        max_queries, max_latency = BUDGETS['vocabulary-export']
+        logger.info(f"vocabulary-export: {len(queries)} queries, {latency:.1f} ms")
+        self.assertLessEqual(len(queries), max_queries, msg="vocabulary-export: budget of SQL queries exceeded")
+        self.assertLessEqual(
+            latency, max_latency * LATENCY_FACTOR, msg="vocabulary-export: budget of latency exceeded"
+        )
+
+    def test_vocabulary_import(self):
+        url = reverse('vocabulary-import', args=[str(self.vocabulary.id)])
+        # Half of lemmas exist in vocabulary
+        rows = [f'{lemma.lemma},{i},NOUN' for i, lemma in enumerate(self.lemmas[:NUM_IMPORT_LEMMAS // 2])]
+        rows += [f'importlemma{i},{i},VERB' for i in range(NUM_IMPORT_LEMMAS // 2)]
+        file_obj = SimpleUploadedFile('list.csv', '\n'.join(['lemma,frequency,pos'] + rows).encode('utf-8'))
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.client.post(url, {'file': file_obj}, format='multipart')
+            latency = (time.perf_counter() - start) * 1000
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['lemmas'], NUM_IMPORT_LEMMAS)
+        self.assertEqual(response.data['created_lemmas'], NUM_IMPORT_LEMMAS // 2)
+
+        max_queries, max_latency = BUDGETS['vocabulary-import']
+        logger.info(f"vocabulary-import: {len(queries)} queries, {latency:.1f} ms")
+        self.assertLessEqual(len(queries), max_queries, msg="vocabulary-import: budget of SQL queries exceeded")
+        self.assertLessEqual(
+            latency, max_latency * LATENCY_FACTOR, msg="vocabulary-import: budget of latency exceeded"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
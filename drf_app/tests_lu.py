@@ -119,6 +119,61 @@ class LangUtilsTestCase(unittest.TestCase):
 
         self.assertEqual(result, expected_result)
 
+    @patch.object(SimVoc, 'PROGRESS_CHUNK_SIZE', 2)
+    def test_create_order_lemmas_cons_mode(self):
+        logger.info(f"test_create_order_lemmas_cons_mode")
+        source_text = "tests Source Text Test"
+
+        self.assertEqual(
+            SimVoc.create_order_lemmas(source_text, cons_mode=True),
+            SimVoc.create_order_lemmas(source_text),
+        )
+
+    def test_create_lemmas_histogram(self):
+        logger.info(f"test_create_lemmas_histogram")
+        result = SimVoc.create_lemmas_histogram("I run every day. The run was long.")
+
+        self.assertEqual(sum(result['run'].values()), 2)
+        self.assertTrue(set(result['run']) <= set(SimVoc.pos_mapping))
+        self.assertEqual(SimVoc.order_lemmas_from_histogram(result)['run'], 2)
+
+    def test_merge_lemmas_histograms(self):
+        logger.info(f"test_merge_lemmas_histograms")
+        result = SimVoc.merge_lemmas_histograms([
+            {'run': {'VERB': 2}, 'text': {'NOUN': 1}},
+            {'run': {'NOUN': 1, 'VERB': 1}},
+        ])
+
+        self.assertEqual(result, {'run': {'VERB': 3, 'NOUN': 1}, 'text': {'NOUN': 1}})
+        self.assertEqual(SimVoc.order_lemmas_from_histogram(result), {'run': 4, 'text': 1})
+        self.assertEqual(SimVoc.dominant_pos(result), {'run': 'VERB', 'text': 'NOUN'})
+        self.assertEqual(SimVoc.dominant_pos({'tie': {'VERB': 1, 'NOUN': 1}}), {'tie': 'NOUN'})
+
+    def test_split_text(self):
+        logger.info(f"test_split_text")
+        result = SimVoc.split_text("one two three four five", 2)
+        self.assertEqual(result, ["one two", "three four", "five"])
+        self.assertEqual(SimVoc.split_text("", 2), [""])
+
+    def test_split_text_offsets(self):
+        logger.info(f"test_split_text_offsets")
+        text = " one, two\nthree  four five "
+        offsets = SimVoc.split_text_offsets(text, 2)
+        self.assertEqual([text[start:end] for start, end in offsets], ["one, two", "three  four", "five"])
+        self.assertEqual(
+            " ".join(SimVoc.clean_text(text[start:end]) for start, end in offsets),
+            SimVoc.clean_text(text)
+        )
+        self.assertEqual(SimVoc.split_text_offsets("", 2), [[0, 0]])
+
+    def test_merge_order_lemmas(self):
+        logger.info(f"test_merge_order_lemmas")
+        result = SimVoc.merge_order_lemmas([{'test': 1, 'source': 1}, {'test': 1, 'text': 3}])
+        expected_result = {'text': 3, 'test': 2, 'source': 1}
+
+        self.assertEqual(result, expected_result)
+        self.assertEqual(list(result.keys()), list(expected_result.keys()))
+
     def test_strategy_get_translate_gtrans(self):
         logger.info(f"test_strategy_get_translate_gtrans")
         text_to_translate = "hello"
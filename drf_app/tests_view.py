@@ -1,21 +1,45 @@
+import asyncio
+import io
 import json
 import os
+import tempfile
+import threading
 import time
 import unittest
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import patch
 from urllib.parse import urlencode
 
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from django.test import modify_settings, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 
-from drf_app.langutils import SimVoc
-from drf_app.models import Lang, Vocabulary, Lemma, Education, Board
+from drf_app import translation
+from drf_app.langutils import SimVoc, UnsupportedLanguage
+from drf_app.notifications import Subscription, vocabulary_channel
+from drf_app.models import Lang, Vocabulary, Lemma, Education, Board, VocabularyLemma, LemmaTranslation
 from drf_app.signals import order_lemmas_create, translate_lemma_signal
-from drf_app.tasks import create_order_lemmas_async, translate_lemma_async
+from drf_app.tasks import (
+    order_lemmas_pipeline, lemmatize_shard_async, translate_lemma_async, requeue_stuck_translations_async,
+    translate_lemma_dispatch
+)
 
 import logging
 
 from drf_app.views import LemmaViewSet
+from simcont import prometheus
+from users.authentication import get_cached_user
+from users.models import CustomUser
 from users.tests import BaseUserCase
 
 if 'DJANGO_SETTINGS_MODULE' in os.environ:
@@ -60,7 +84,7 @@ class BaseViewTestCase(BaseUserCase):
 
         post_save.connect(order_lemmas_create, sender=Vocabulary)
 
-        create_order_lemmas_async(Vocabulary.objects.first().id)
+        order_lemmas_pipeline(Vocabulary.objects.first().id).apply()
 
 
     @classmethod
@@ -83,6 +107,13 @@ class VocabularyTests(BaseViewTestCase):
         if profile_response.status_code != status.HTTP_200_OK:
             logger.info(f"Login for VocabularyTests failed . Test response content: {profile_response.content}")
 
+    def other_vocabulary(self):
+        # Vocabulary of other author without learners, user of tests has no access to it
+        author = CustomUser.objects.create_user('other@example.com', 'testpassword', is_active=True)
+        return Vocabulary.objects.create(
+            title='Other Vocabulary', author=author, lang_from=self.lang_from, lang_to=self.lang_to
+        )
+
     def test_create_vocabulary(self):
         logger.info(f"test_create_vocabulary")
         # order_lemmas_create(sender=Vocabulary, instance=self.created_vocabulary, created=True)
@@ -91,12 +122,267 @@ class VocabularyTests(BaseViewTestCase):
         self.assertEqual(Lemma.objects.count(), 3)
         self.assertEqual(self.created_vocabulary.title, 'Test Vocabulary')
 
+    @patch('drf_app.signals.order_lemmas_pipeline')
+    def test_create_vocabulary_on_commit(self, mock_pipeline):
+        logger.info(f"test_create_vocabulary_on_commit")
+        url = reverse('vocabulary-list')
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            response = self.authenticated_client.post(url, self.vocabulary_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Pipeline is sent only after commit and vocabulary is saved once
+        mock_pipeline.assert_not_called()
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "drf_app_vocabulary"')])
+        for callback in callbacks:
+            callback()
+        mock_pipeline.assert_called_once_with(uuid.UUID(response.data['id']))
+
+    def test_create_vocabulary_learners_queries(self):
+        logger.info(f"test_create_vocabulary_learners_queries")
+        learners = CustomUser.objects.bulk_create(
+            [CustomUser(email=f"learner{i}@example.com") for i in range(50)]
+        )
+        data = dict(self.vocabulary_data, learners_id=[str(learner.id) for learner in learners])
+        get_cached_user(self.user.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authenticated_client.post(reverse('vocabulary-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['learners']), 50)
+        # User of authentication is cached, users are read for check of learners_id and response,
+        # learners are added by one INSERT
+        self.assertEqual(len([q for q in queries if 'FROM "users_customuser"' in q['sql']]), 2)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT INTO "drf_app_learnervocabulary"')]), 1)
+
+    def test_create_vocabulary_unknown_learner(self):
+        logger.info(f"test_create_vocabulary_unknown_learner")
+        data = dict(self.vocabulary_data, learners_id=[str(self.user.id), '999999'])
+        response = self.authenticated_client.post(reverse('vocabulary-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('learners_id', response.data)
+
+    def test_add_remove_vocabulary_learners(self):
+        logger.info(f"test_add_remove_vocabulary_learners")
+        learners = CustomUser.objects.bulk_create(
+            [CustomUser(email=f"learner{i}@example.com") for i in range(3)]
+        )
+        learners_id = [str(learner.id) for learner in learners]
+        url = reverse('vocabulary-learners', args=[str(self.created_vocabulary.id)])
+
+        response = self.authenticated_client.post(url, {'learners_id': learners_id + [str(self.user.id)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['changed'], 3)
+        self.assertEqual(self.created_vocabulary.learners.count(), 4)
+
+        response = self.authenticated_client.delete(url, {'learners_id': learners_id[:2]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['changed'], 2)
+        self.assertEqual(set(response.data['learners_id']), {self.user.id, learners[2].id})
+
+    def test_export_vocabulary(self):
+        logger.info(f"test_export_vocabulary")
+        lemma = Lemma.objects.get(lemma='test')
+        LemmaTranslation.objects.create(
+            lemma=lemma, lang='ru', translate_status=Lemma.TranslateStatus.TRANSLATED,
+            translate=json.dumps({"main_translate": ["test", "tɛst", "тест", "NOUN"], "extra_data": [], "user_inf": []}),
+        )
+        url = reverse('vocabulary-export', args=[str(self.created_vocabulary.id)])
+
+        response = self.authenticated_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'lemma,frequency,pos,translation,pronunciation')
+        self.assertEqual(lines[1], f'test,2,{lemma.pos},тест,tɛst')
+        self.assertEqual(len(lines), 4)
+
+        response = self.authenticated_client.get(url, {'file_format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(rows[0]['translation'], 'тест')
+        self.assertEqual(rows[1]['translation'], '')
+
+        response = self.authenticated_client.get(url, {'file_format': 'anki'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[3], f'test\tтест [tɛst]\t{lemma.pos}')
+
+        response = self.authenticated_client.get(url, {'file_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_export_vocabulary_asgi(self):
+        logger.info(f"test_export_vocabulary_asgi")
+        url = reverse('vocabulary-export', args=[str(self.created_vocabulary.id)])
+        headers = {'AUTHORIZATION': f"Bearer {self.login_response.data['access']}"}
+
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Under ASGI export is streamed by async iterator, not read to the end before send
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'lemma,frequency,pos,translation,pronunciation')
+        self.assertEqual(len(lines), 4)
+
+    def test_import_vocabulary_lemmas(self):
+        logger.info(f"test_import_vocabulary_lemmas")
+        url = reverse('vocabulary-import', args=[str(self.created_vocabulary.id)])
+        csv_file = SimpleUploadedFile(
+            'list.csv', 'lemma,frequency,pos\ntest,10,NOUN\nhouse,7,NOUN\nGo,5,VERB\n'.encode('utf-8')
+        )
+        response = self.authenticated_client.post(url, {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'lemmas': 3, 'created_lemmas': 2, 'created': 2, 'updated': 1})
+        self.assertEqual(
+            VocabularyLemma.objects.get(throughVocabulary=self.created_vocabulary, throughLemma__lemma='test').frequency,
+            10
+        )
+        self.assertEqual(Lemma.objects.get(lemma='go').pos, Lemma.Pos.VERB)
+        self.assertEqual(Lemma.objects.get(lemma='test').pos, Lemma.Pos.NOUN)
+        order_lemmas = json.loads(Vocabulary.objects.get(pk=self.created_vocabulary.id).order_lemmas)
+        self.assertEqual(list(order_lemmas.items())[:3], [('test', 10), ('house', 7), ('go', 5)])
+
+        ndjson_file = SimpleUploadedFile('list.ndjson', b'{"lemma": "house", "frequency": 7}\n')
+        response = self.authenticated_client.post(url, {'file': ndjson_file}, format='multipart')
+        self.assertEqual(response.data, {'lemmas': 1, 'created_lemmas': 0, 'created': 0, 'updated': 0})
+
+    def test_import_vocabulary_lemmas_invalid(self):
+        logger.info(f"test_import_vocabulary_lemmas_invalid")
+        url = reverse('vocabulary-import', args=[str(self.created_vocabulary.id)])
+        json_file = SimpleUploadedFile('list.json', b'[{"lemma": "house", "frequency": 7}, {"lemma": "car", "pos": "XYZ"}]')
+        response = self.authenticated_client.post(url, {'file': json_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Row 2', response.data['detail'])
+        # Import is cancelled
+        self.assertFalse(Lemma.objects.filter(lemma='house').exists())
+
+    def test_ingest_corpus_command(self):
+        logger.info(f"test_ingest_corpus_command")
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, 'first.txt').write_text("Tests source text test", encoding='utf-8')
+            Path(directory, 'second.txt').write_text("House and houses", encoding='utf-8')
+            Path(directory, 'extra.txt').write_text("Extra text", encoding='utf-8')
+            Path(directory, 'notes.md').write_text("skipped", encoding='utf-8')
+            vocabularies = Vocabulary.objects.count()
+
+            # One process: window of two documents in pool, the third one is sent after result
+            call_command('ingest_corpus', directory, author=self.user.email, workers=1, batch_size=1,
+                         stdout=io.StringIO())
+
+            self.assertEqual(Vocabulary.objects.count(), vocabularies + 3)
+            vocabulary = Vocabulary.objects.get(title='second')
+            self.assertEqual(vocabulary.processing_status, Vocabulary.ProcessingStatus.DONE)
+            self.assertEqual(vocabulary.get_source_text(), "House and houses")
+            self.assertEqual(
+                VocabularyLemma.objects.get(throughVocabulary=vocabulary, throughLemma__lemma='house').frequency, 2
+            )
+
+            # Documents of manifest are skipped after restart
+            Path(directory, 'third.txt').write_text("Text", encoding='utf-8')
+            call_command('ingest_corpus', directory, author=self.user.email, workers=0, stdout=io.StringIO())
+            self.assertEqual(Vocabulary.objects.count(), vocabularies + 4)
+
     def test_retrieve_vocabulary(self):
         logger.info(f"test_retrieve_vocabulary")
         url = reverse('vocabulary-detail', args=[str(self.created_vocabulary.id)])
         response = self.authenticated_client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['title'], 'Test Vocabulary')
+        self.assertNotIn('source_text', response.data)
+
+    def test_get_vocabulary_processing(self):
+        logger.info(f"test_get_vocabulary_processing")
+        url = reverse('vocabulary-processing', args=[str(self.created_vocabulary.id)])
+        response = self.authenticated_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['processing_status'], Vocabulary.ProcessingStatus.DONE)
+        self.assertEqual(response.data['processing_progress'], 100)
+
+        # Vocabulary of other author isn't available
+        url = reverse('vocabulary-processing', args=[str(self.other_vocabulary().id)])
+        response = self.authenticated_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_vocabulary_processing(self):
+        logger.info(f"test_async_vocabulary_processing")
+        url = reverse('async-vocabulary-processing', args=[str(self.created_vocabulary.id)])
+        headers = {'AUTHORIZATION': f"Bearer {self.login_response.data['access']}"}
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.async_client.get(url, {'wait': 5}, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['processing_status'], Vocabulary.ProcessingStatus.DONE)
+
+        url = reverse('async-vocabulary-processing', args=[str(uuid.uuid4())])
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        other_vocabulary = await sync_to_async(self.other_vocabulary)()
+        url = reverse('async-vocabulary-processing', args=[str(other_vocabulary.id)])
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_vocabulary_notification(self):
+        logger.info(f"test_vocabulary_notification")
+        voc_id = str(self.created_vocabulary.id)
+
+        def run_pipeline():
+            with self.captureOnCommitCallbacks(execute=True):
+                order_lemmas_pipeline(voc_id).apply()
+
+        async def wait_notification():
+            async with Subscription(vocabulary_channel(voc_id)) as subscription:
+                await sync_to_async(run_pipeline)()
+                return await subscription.wait(5)
+
+        channel, data = async_to_sync(wait_notification)()
+        self.assertEqual(channel, vocabulary_channel(voc_id))
+        self.assertEqual(data['processing_status'], Vocabulary.ProcessingStatus.DONE)
+
+    @override_settings(NLP_SHARD_SIZE=2)
+    def test_order_lemmas_pipeline_shards(self):
+        logger.info(f"test_order_lemmas_pipeline_shards")
+        with patch('drf_app.tasks.lemmatize_shard_async.s', wraps=lemmatize_shard_async.s) as mock_shard:
+            order_lemmas_pipeline(self.created_vocabulary.id).apply()
+        # Shards are sent as bounds in source text, not as text
+        self.assertEqual([call.args for call in mock_shard.call_args_list], [(0, 12), (13, 22)])
+        self.assertEqual(
+            json.loads(Vocabulary.objects.get(pk=self.created_vocabulary.id).order_lemmas),
+            {'test': 2, 'source': 1, 'text': 1}
+        )
+
+    def test_repeat_order_lemmas_pipeline(self):
+        logger.info(f"test_repeat_order_lemmas_pipeline")
+        order_lemmas_pipeline(self.created_vocabulary.id).apply()
+        self.assertEqual(Lemma.objects.count(), 3)
+        self.assertEqual(
+            VocabularyLemma.objects.get(throughVocabulary=self.created_vocabulary, throughLemma__lemma='test').frequency,
+            2
+        )
+        lemmas_pos = SimVoc.dominant_pos(SimVoc.create_lemmas_histogram(self.vocabulary_data['source_text']))
+        self.assertEqual(Lemma.objects.get(lemma='test').pos, lemmas_pos['test'])
+
+    @unittest.skipIf(prometheus.prometheus_client is None, "prometheus_client is not installed")
+    def test_order_lemmas_metrics(self):
+        logger.info(f"test_order_lemmas_metrics")
+        registry = prometheus.prometheus_client.REGISTRY
+        tokens = registry.get_sample_value('simcont_nlp_tokens_total')
+        ingested = registry.get_sample_value(
+            'simcont_celery_tasks_total', {'task': 'drf_app.tasks.ingest_order_lemmas_async', 'state': 'success'}
+        )
+        order_lemmas_pipeline(self.created_vocabulary.id).apply()
+        self.assertGreater(registry.get_sample_value('simcont_nlp_tokens_total'), tokens)
+        self.assertEqual(registry.get_sample_value(
+            'simcont_celery_tasks_total', {'task': 'drf_app.tasks.ingest_order_lemmas_async', 'state': 'success'}
+        ), ingested + 1)
+        self.assertGreater(
+            registry.get_sample_value('simcont_nlp_stage_duration_seconds_count', {'stage': 'lemmatize'}), 0
+        )
+
+    def test_get_vocabulary_source_text(self):
+        logger.info(f"test_get_vocabulary_source_text")
+        self.assertEqual(self.created_vocabulary.get_source_text(), self.vocabulary_data['source_text'])
+
+        url = reverse('vocabulary-source-text', args=[str(self.created_vocabulary.id)])
+        response = self.authenticated_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['text'], self.vocabulary_data['source_text'])
 
     def test_list_vocabulary(self):
         logger.info(f"test_list_vocabulary")
@@ -105,6 +391,77 @@ class VocabularyTests(BaseViewTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 1)
 
+    def test_list_lemma_page_size(self):
+        logger.info(f"test_list_lemma_page_size")
+        url = reverse('lemma-list')
+        response = self.authenticated_client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(response.data["count"], 3)
+        self.assertIsNotNone(response.data["next"])
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0, REQUEST_METRICS_SERVER_TIMING=True)
+    def test_request_metrics(self):
+        logger.info(f"test_request_metrics")
+        url = reverse('vocabulary-list')
+        with self.assertLogs('simcont.metrics', level='INFO') as logs:
+            response = self.authenticated_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+        self.assertGreater(logs.records[0].queries, 0)
+        self.assertEqual(logs.records[0].view, 'vocabulary-list')
+        self.assertIn('X-Request-ID', response)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_request_metrics_not_sampled(self):
+        logger.info(f"test_request_metrics_not_sampled")
+        response = self.authenticated_client.get(reverse('vocabulary-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_list_vocabulary_lemmas(self):
+        logger.info(f"test_list_vocabulary_lemmas")
+        url = reverse('vocabulary-lemmas', args=[str(self.created_vocabulary.id)])
+        response = self.authenticated_client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['lemma'] for item in response.data['results']][0], 'test')
+        self.assertEqual(response.data['results'][0]['frequency'], 2)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response_next = self.authenticated_client.get(response.data['next'])
+        self.assertEqual(len(response_next.data['results']), 1)
+        self.assertIsNone(response_next.data['next'])
+        lemmas = [item['lemma'] for item in response.data['results'] + response_next.data['results']]
+        self.assertEqual(sorted(lemmas), ['source', 'test', 'text'])
+
+        response = self.authenticated_client.get(url, {'cursor': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_vocabulary_lemmas_translations(self):
+        logger.info(f"test_list_vocabulary_lemmas_translations")
+        translate = json.dumps({"main_translate": ["test", "tɛst", "тест", "NOUN"], "extra_data": [], "user_inf": []})
+        LemmaTranslation.objects.create(
+            lemma=Lemma.objects.get(lemma='test'), lang='ru', translate_status=Lemma.TranslateStatus.TRANSLATED,
+            translate=translate,
+        )
+        Lang.objects.create(name='German', short_name='de')
+        url = reverse('vocabulary-lemmas', args=[str(self.created_vocabulary.id)])
+
+        # By default translations to lang_to of vocabulary
+        response = self.authenticated_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['lemma'], 'test')
+        self.assertEqual(response.data['results'][0]['translate'], translate)
+        self.assertEqual(response.data['results'][0]['translate_status'], Lemma.TranslateStatus.TRANSLATED)
+
+        response = self.authenticated_client.get(url, {'lang_to': 'de'})
+        self.assertIsNone(response.data['results'][0]['translate'])
+        self.assertEqual(response.data['results'][0]['translate_status'], Lemma.TranslateStatus.ROOKIE)
+
+        response = self.authenticated_client.get(url, {'lang_to': 'zz'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_list_vocabulary_languages(self):
         logger.info(f"test_list_vocabulary_languages")
         url = reverse('vocabulary-languages')
@@ -273,6 +630,293 @@ class LemmaTests(BaseViewTestCase):
 
         post_save.connect(translate_lemma_signal, sender=LemmaViewSet)
 
+    def test_claim_translate_lemma(self):
+        logger.info(f"test_claim_translate_lemma")
+        lemma = Lemma.objects.create(lemma="claim")
+
+        self.assertTrue(LemmaTranslation.claim(lemma.pk, 'ru'))
+        self.assertFalse(LemmaTranslation.claim(lemma.pk, 'ru'))
+        self.assertTrue(LemmaTranslation.claim(lemma.pk, 'de'))
+
+        translation = LemmaTranslation.objects.get(lemma=lemma, lang='ru')
+        self.assertEqual(translation.translate_status, Lemma.TranslateStatus.IN_PROGRESS)
+        lemma.delete()
+
+    @patch('drf_app.tasks.translate_lemma_async.apply_async')
+    def test_requeue_stuck_translations(self, mock_apply_async):
+        logger.info(f"test_requeue_stuck_translations")
+        lemma = Lemma.objects.create(lemma="stuck")
+        LemmaTranslation.claim(lemma.pk, 'ru')
+        LemmaTranslation.objects.filter(lemma=lemma).update(time_translate_claim=timezone.now() - timedelta(days=1))
+
+        requeue_stuck_translations_async()
+        requeue_stuck_translations_async()
+
+        mock_apply_async.assert_called_once()
+        lemma.delete()
+
+    @override_settings(TRANSLATE_MAX_ATTEMPTS=1)
+    @patch('drf_app.tasks.translate_lemma_async.apply_async')
+    def test_requeue_stuck_translations_failed(self, mock_apply_async):
+        logger.info(f"test_requeue_stuck_translations_failed")
+        lemma = Lemma.objects.create(lemma="stuck")
+        LemmaTranslation.claim(lemma.pk, 'ru')
+        for _ in range(2):
+            LemmaTranslation.objects.filter(lemma=lemma).update(time_translate_claim=timezone.now() - timedelta(days=1))
+            requeue_stuck_translations_async()
+
+        # Sent again once, then translation is failed and isn't sent more
+        mock_apply_async.assert_called_once()
+        translation = LemmaTranslation.objects.get(lemma=lemma, lang='ru')
+        self.assertEqual(translation.attempts, 1)
+        self.assertEqual(translation.translate_status, Lemma.TranslateStatus.FAILED)
+        lemma.delete()
+
+    @override_settings(TRANSLATE_STRATEGIES=['test_rejecting'])
+    def test_translate_lemma_rejected(self):
+        logger.info(f"test_translate_lemma_rejected")
+
+        def rejecting(text_to_translate, lang_to):
+            raise UnsupportedLanguage(f"Language '{lang_to}' is not supported.")
+
+        translation.register('test_rejecting', failure_threshold=1)(rejecting)
+        lemma = Lemma.objects.create(lemma="rejected")
+        try:
+            LemmaTranslation.claim(lemma.pk, 'ru')
+            translate_lemma_async(str(lemma.pk), 'test_rejecting', 'ru')
+
+            lemma_translation = LemmaTranslation.objects.get(lemma=lemma, lang='ru')
+            self.assertEqual(lemma_translation.translate_status, Lemma.TranslateStatus.FAILED)
+            # Rejected input isn't failure of provider
+            self.assertFalse(translation.get_provider('test_rejecting').is_open())
+        finally:
+            translation._registry.pop('test_rejecting')
+            cache.clear()
+            lemma.delete()
+
+    def test_translate_lemma_unknown_language(self):
+        logger.info(f"test_translate_lemma_unknown_language")
+        lemma = Lemma.objects.get(lemma='test')
+        url = reverse('lemma-translate', args=[str(lemma.id)]) + '?' + urlencode({'lang_to': 'zz'})
+        response = self.authenticated_client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertFalse(translate_lemma_dispatch(lemma.pk, 'zz'))
+        self.assertFalse(LemmaTranslation.objects.filter(lemma=lemma, lang='zz').exists())
+
+    @override_settings(TRANSLATE_STRATEGIES=['test_broken', 'test_working'])
+    def test_translate_lemma_fallback(self):
+        logger.info(f"test_translate_lemma_fallback")
+        calls = []
+
+        def broken(text_to_translate, lang_to):
+            calls.append(text_to_translate)
+            return "main_translate: unparsable text of provider"
+
+        def working(text_to_translate, lang_to):
+            return SimVoc.create_translation_json([text_to_translate, '', 'запасной', 'NOUN'])
+
+        translation.register('test_broken', failure_threshold=2)(broken)
+        translation.register('test_working')(working)
+        try:
+            for text in ("fallback1", "fallback2", "fallback3"):
+                lemma = Lemma.objects.create(lemma=text)
+                LemmaTranslation.claim(lemma.pk, 'ru')
+                translate_lemma_async(str(lemma.pk), 'test_broken', 'ru')
+
+                lemma_translation = LemmaTranslation.objects.get(lemma=lemma, lang='ru')
+                self.assertEqual(lemma_translation.translate_status, Lemma.TranslateStatus.TRANSLATED)
+                self.assertEqual(lemma_translation.strategy, 'test_working')
+                self.assertEqual(lemma_translation.pos, 'NOUN')
+                lemma.delete()
+            # Circuit breaker is open after 2 failures, so broken provider is skipped
+            self.assertEqual(calls, ["fallback1", "fallback2"])
+        finally:
+            translation._registry.pop('test_broken')
+            translation._registry.pop('test_working')
+            cache.clear()
+
+    @override_settings(TRANSLATE_STRATEGIES=['test_hung', 'test_working'])
+    def test_translate_hung_provider(self):
+        logger.info(f"test_translate_hung_provider")
+        released = threading.Event()
+
+        def hung(text_to_translate, lang_to):
+            released.wait(5)
+            return SimVoc.create_translation_json([text_to_translate, '', 'завис', 'X'])
+
+        def working(text_to_translate, lang_to):
+            return SimVoc.create_translation_json([text_to_translate, '', 'запасной', 'NOUN'])
+
+        translation.register('test_hung', timeout=0.05, max_threads=1)(hung)
+        translation.register('test_working', timeout=0.5)(working)
+        try:
+            self.assertEqual(translation.translate_with_fallback("hung1", 'ru')[0], 'test_working')
+            # Thread of hung provider is busy, it is skipped without waiting and fallback isn't delayed
+            start = time.perf_counter()
+            self.assertEqual(translation.translate_with_fallback("hung2", 'ru')[0], 'test_working')
+            self.assertLess(time.perf_counter() - start, 0.05)
+        finally:
+            released.set()
+            translation._registry.pop('test_hung')
+            translation._registry.pop('test_working')
+            cache.clear()
+
+    @override_settings(TRANSLATE_STRATEGIES=['test_slow'])
+    def test_translate_lemma_timeout(self):
+        logger.info(f"test_translate_lemma_timeout")
+
+        def slow(text_to_translate, lang_to):
+            time.sleep(0.5)
+            return SimVoc.create_translation_json([text_to_translate, '', 'медленно', 'ADV'])
+
+        translation.register('test_slow', timeout=0.05)(slow)
+        lemma = Lemma.objects.create(lemma="slow")
+        try:
+            LemmaTranslation.claim(lemma.pk, 'ru')
+            translate_lemma_async(str(lemma.pk), 'test_slow', 'ru')
+
+            lemma_translation = LemmaTranslation.objects.get(lemma=lemma, lang='ru')
+            self.assertEqual(lemma_translation.translate_status, Lemma.TranslateStatus.IN_PROGRESS)
+        finally:
+            translation._registry.pop('test_slow')
+            cache.clear()
+            lemma.delete()
+
+    @override_settings(TRANSLATE_STRATEGIES=['test_async'])
+    # Sync-only middleware (debug toolbar of DEV) runs async view in main thread, so task can't run while client waits
+    @modify_settings(MIDDLEWARE={'remove': 'debug_toolbar.middleware.DebugToolbarMiddleware'})
+    def test_async_translate_lemma(self):
+        logger.info(f"test_async_translate_lemma")
+        lemma = Lemma.objects.create(lemma="async")
+        url = reverse('async-lemma-translate', args=[str(lemma.id)])
+        headers = {'AUTHORIZATION': f"Bearer {self.login_response.data['access']}"}
+        translation.register('test_async')(
+            lambda text_to_translate, lang_to: SimVoc.create_translation_json([text_to_translate, '', 'асинх', 'X'])
+        )
+        async def get_translation(**params):
+            return await self.async_client.get(url, {'lang_to': 'ru', **params}, headers=headers)
+
+        try:
+            with patch('drf_app.tasks.translate_lemma_async.apply_async') as mock_apply_async, \
+                    self.captureOnCommitCallbacks(execute=True):
+                response = async_to_sync(get_translation)()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['translate_status'], Lemma.TranslateStatus.IN_PROGRESS)
+            mock_apply_async.assert_called_once()
+
+            # Client waits for translation finished by task
+            async def translate_while_waiting():
+                response, _ = await asyncio.gather(get_translation(wait=5), translate_later())
+                return response
+
+            async def translate_later():
+                await asyncio.sleep(0.3)
+                await sync_to_async(translate_lemma_async)(str(lemma.id), 'test_async', 'ru')
+
+            response = async_to_sync(translate_while_waiting)()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['translate_status'], Lemma.TranslateStatus.TRANSLATED)
+            self.assertEqual(json.loads(response.json()['translate'])['main_translate'][2], 'асинх')
+        finally:
+            translation._registry.pop('test_async')
+            lemma.delete()
+
+    @override_settings(TRANSLATE_STRATEGIES=['test_async'])
+    @modify_settings(MIDDLEWARE={'remove': 'debug_toolbar.middleware.DebugToolbarMiddleware'})
+    def test_async_events(self):
+        logger.info(f"test_async_events")
+        translated = Lemma.objects.create(lemma="pushed")
+        LemmaTranslation.objects.create(
+            lemma=translated,
+            lang='ru',
+            translate=SimVoc.create_translation_json(['pushed', '', 'отправлен', 'X']),
+            translate_status=Lemma.TranslateStatus.TRANSLATED,
+        )
+        lemma = Lemma.objects.create(lemma="stream")
+        for vocabulary_lemma in (translated, lemma):
+            VocabularyLemma.objects.create(throughVocabulary=self.created_vocabulary, throughLemma=vocabulary_lemma)
+        foreign = Lemma.objects.create(lemma="foreign")
+        url = reverse('async-events')
+        headers = {'AUTHORIZATION': f"Bearer {self.login_response.data['access']}"}
+        translation.register('test_async')(
+            lambda text_to_translate, lang_to: SimVoc.create_translation_json([text_to_translate, '', 'поток', 'X'])
+        )
+
+        async def read_events(params):
+            response = await self.async_client.get(url, params, headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+            return [
+                (lines[0].removeprefix('event: '), json.loads(lines[1].removeprefix('data: ')))
+                for lines in (event.split('\n') for event in content.split('\n\n'))
+                if lines[0].startswith('event: ')
+            ]
+
+        async def translate_later():
+            await asyncio.sleep(0.3)
+            await sync_to_async(translate_lemma_async)(str(lemma.id), 'test_async', 'ru')
+
+        async def read_while_translating():
+            events, _ = await asyncio.gather(
+                read_events({'lemma': [str(translated.id), str(lemma.id)], 'lang_to': 'ru', 'timeout': 5}),
+                translate_later(),
+            )
+            return events
+
+        try:
+            with patch('drf_app.tasks.translate_lemma_async.apply_async'):
+                events = async_to_sync(read_while_translating)()
+            self.assertEqual(
+                [(event, data.get('id'), data.get('translate_status')) for event, data in events],
+                [
+                    ('translation', str(translated.id), Lemma.TranslateStatus.TRANSLATED),
+                    ('translation', str(lemma.id), Lemma.TranslateStatus.IN_PROGRESS),
+                    ('translation', str(lemma.id), Lemma.TranslateStatus.TRANSLATED),
+                    ('end', None, None),
+                ]
+            )
+            self.assertEqual(json.loads(events[2][1]['translate'])['main_translate'][2], 'поток')
+            self.assertEqual(events[3][1]['pending'], [])
+
+            # Lemma which isn't in vocabularies of user isn't subscribed
+            events = async_to_sync(read_events)({'lemma': str(foreign.id), 'timeout': 5})
+            self.assertEqual(events, [
+                ('translation', {'id': str(foreign.id), 'detail': 'Not found.'}),
+                ('end', {'pending': []}),
+            ])
+
+            async def read_invalid():
+                return await self.async_client.get(url, {'lemma': 'bad'}, headers=headers)
+
+            self.assertEqual(async_to_sync(read_invalid)().status_code, status.HTTP_400_BAD_REQUEST)
+        finally:
+            translation._registry.pop('test_async')
+            lemma.delete()
+            translated.delete()
+            foreign.delete()
+
+    def test_translate_lemma_languages(self):
+        logger.info(f"test_translate_lemma_languages")
+        Lang.objects.create(name='German', short_name='de')
+        lemma = Lemma.objects.create(lemma="multi")
+        for lang, text in (('ru', 'мульти'), ('de', 'multi-de')):
+            LemmaTranslation.objects.create(
+                lemma=lemma,
+                lang=lang,
+                translate=SimVoc.create_translation_json(['multi', '', text, 'X']),
+                translate_status=Lemma.TranslateStatus.TRANSLATED,
+            )
+
+        url = reverse('lemma-translate', args=[str(lemma.id)]) + '?' + urlencode({'lang_to': 'de'})
+        response = self.authenticated_client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['lang'], 'de')
+        self.assertEqual(response.data['translate_status'], Lemma.TranslateStatus.TRANSLATED)
+        self.assertEqual(json.loads(response.data['translate'])['main_translate'][2], 'multi-de')
+        lemma.delete()
+
     def test_get_id_lemma_by_token(self):
         logger.info(f"test_get_id_lemma_by_token")
 
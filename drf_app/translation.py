@@ -0,0 +1,210 @@
+"""
+Registry of strategies (providers) of translation with ordered fallback chain.
+Every call of provider is limited by timeout and runs in own threads of provider, so hung provider doesn't delay
+the others. Result is validated, and provider which failed several times in a row is skipped by circuit breaker
+until reset timeout passes. Input which provider rejects (unsupported language) isn't failure of provider.
+State of breakers is kept in Django cache (Redis, see settings.CACHES), so it is common for all workers.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable
+
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.core.cache import cache
+
+from simcont.prometheus import TRANSLATIONS, TRANSLATION_DURATION
+from .langutils import UnsupportedLanguage
+
+import logging
+logger = logging.getLogger(__name__)
+
+BREAKER_CACHE_PREFIX = 'translate:breaker'
+
+
+class TranslationError(Exception):
+    pass
+
+
+class ProviderUnavailable(TranslationError):
+    """
+    Circuit breaker of provider is open.
+    """
+
+
+class UnsupportedInput(TranslationError):
+    """
+    Provider rejected input (for example unknown language), breaker doesn't count it.
+    """
+
+
+class TranslationProvider:
+    """
+    Strategy of translate: function(text_to_translate, lang_to) -> JSON string (see SimVoc.create_translation_json).
+    Function can be set by name of SimVoc.strategy_<name>, it is resolved on first call.
+    Calls are run in own pool of provider (max_threads), call is started only if thread is free, so timeout
+    doesn't include waiting in queue. If all threads are busy (provider hangs), provider is skipped at once.
+    """
+    def __init__(self, name: str, function: Callable = None, timeout: float = None,
+                 failure_threshold: int = None, reset_timeout: float = None, max_threads: int = None):
+        self.name = name
+        self._function = function
+        self.timeout = timeout if timeout is not None else settings.TRANSLATE_PROVIDER_TIMEOUT
+        self.max_threads = max_threads if max_threads is not None else settings.TRANSLATE_PROVIDER_THREADS
+        self._executor = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix=f"translate-{name}")
+        self._free_threads = threading.BoundedSemaphore(self.max_threads)
+        self.failure_threshold = (failure_threshold if failure_threshold is not None
+                                  else settings.TRANSLATE_BREAKER_FAILURES)
+        self.reset_timeout = reset_timeout if reset_timeout is not None else settings.TRANSLATE_BREAKER_RESET
+
+    @property
+    def function(self) -> Callable:
+        if self._function is None:
+            from .langutils import SimVoc
+
+            self._function = getattr(SimVoc, f"strategy_{self.name}")
+        return self._function
+
+    def __repr__(self):
+        return f"TranslationProvider({self.name!r})"
+
+    # Circuit breaker
+    def _key(self, suffix: str) -> str:
+        return f"{BREAKER_CACHE_PREFIX}:{self.name}:{suffix}"
+
+    def is_open(self) -> bool:
+        open_until = cache.get(self._key('open_until'))
+        return open_until is not None and open_until > time.time()
+
+    def record_success(self) -> None:
+        cache.delete_many([self._key('failures'), self._key('open_until')])
+
+    def record_failure(self) -> None:
+        key = self._key('failures')
+        cache.add(key, 0, timeout=self.reset_timeout)
+        try:
+            failures = cache.incr(key)
+        except ValueError:  # key expired between add and incr
+            failures = 1
+            cache.set(key, failures, timeout=self.reset_timeout)
+        if failures >= self.failure_threshold:
+            cache.set(self._key('open_until'), time.time() + self.reset_timeout, timeout=self.reset_timeout)
+            cache.delete(key)
+            logger.warning("Circuit breaker of translate provider %s is open for %s seconds after %s failures.",
+                           self.name, self.reset_timeout, failures)
+
+    def translate(self, text_to_translate: str, lang_to: str) -> str:
+        """
+        Translate by provider. Raise ProviderUnavailable if breaker is open, UnsupportedInput if provider
+        rejected input, TranslationError if provider failed, returned invalid response or didn't respond in timeout.
+        """
+        if self.is_open():
+            TRANSLATIONS.labels(self.name, 'skipped').inc()
+            raise ProviderUnavailable(f"Provider {self.name} is unavailable.")
+
+        if not self._free_threads.acquire(blocking=False):
+            TRANSLATIONS.labels(self.name, 'skipped').inc()
+            raise ProviderUnavailable(f"Provider {self.name} is busy: all {self.max_threads} threads wait for it.")
+
+        start = time.perf_counter()
+        future = self._executor.submit(self.function, text_to_translate, lang_to)
+        future.add_done_callback(lambda _: self._free_threads.release())
+        try:
+            lemma_translated = future.result(timeout=self.timeout)
+            parse_translation(lemma_translated)
+        except FutureTimeoutError:
+            # Thread of provider can't be stopped, it finishes in background and its result is ignored
+            self._fail('timeout', start)
+            raise TranslationError(f"Provider {self.name} didn't respond in {self.timeout} seconds.")
+        except SoftTimeLimitExceeded:
+            raise
+        except UnsupportedLanguage as e:
+            TRANSLATIONS.labels(self.name, 'rejected').inc()
+            raise UnsupportedInput(f"Provider {self.name} rejected input: {e}") from e
+        except Exception as e:
+            self._fail('failed', start)
+            raise TranslationError(f"Provider {self.name} failed: {e}") from e
+
+        TRANSLATION_DURATION.labels(self.name).observe(time.perf_counter() - start)
+        self.record_success()
+        return lemma_translated
+
+    def _fail(self, result: str, start: float) -> None:
+        TRANSLATION_DURATION.labels(self.name).observe(time.perf_counter() - start)
+        TRANSLATIONS.labels(self.name, result).inc()
+        self.record_failure()
+
+
+_registry = {}
+
+
+def register(name: str, **options) -> Callable:
+    """
+    Decorator which registers function as provider of translation:
+        @register('get_translate_my', timeout=5)
+        def my_strategy(text_to_translate, lang_to): ...
+    """
+    def decorator(function):
+        _registry[name] = TranslationProvider(name, function, **options)
+        return function
+    return decorator
+
+
+def get_provider(name: str) -> TranslationProvider:
+    """
+    Provider by name, built-in strategies of SimVoc are registered on first request.
+    """
+    if name not in _registry:
+        from .langutils import SimVoc
+
+        if not callable(getattr(SimVoc, f"strategy_{name}", None)):
+            raise KeyError(f"Strategy of translate {name} does not exist.")
+        _registry[name] = TranslationProvider(name)
+    return _registry[name]
+
+
+def get_chain(strategy: str = None) -> list:
+    """
+    Ordered providers to try: strategy (if it is set), then settings.TRANSLATE_STRATEGIES.
+    Unknown strategies are skipped with error in log.
+    """
+    names = [strategy] if strategy else []
+    names += [name for name in settings.TRANSLATE_STRATEGIES if name != strategy]
+    providers = []
+    for name in names:
+        try:
+            providers.append(get_provider(name))
+        except KeyError as e:
+            logger.error("%s", e)
+    return providers
+
+
+def translate_with_fallback(text_to_translate: str, lang_to: str, strategy: str = None) -> tuple:
+    """
+    Translate by the first provider of chain which succeeded. Return (name of provider, JSON of translation).
+    Raise UnsupportedInput if all providers rejected input, TranslationError if all providers failed,
+    rejected input or are unavailable.
+    """
+    errors = []
+    rejected = True
+    for provider in get_chain(strategy):
+        try:
+            return provider.name, provider.translate(text_to_translate, lang_to)
+        except TranslationError as e:
+            logger.warning("%s", e)
+            errors.append(str(e))
+            rejected = rejected and isinstance(e, UnsupportedInput)
+    error_class = UnsupportedInput if errors and rejected else TranslationError
+    raise error_class("; ".join(errors) or "No providers of translate.")
+
+
+def parse_translation(lemma_translated: str) -> list:
+    """
+    main_translate of translation JSON: [lemma, pronunciation, translation, pos]. Raise ValueError if it is invalid.
+    """
+    main_translate = json.loads(lemma_translated).get("main_translate")
+    if not isinstance(main_translate, list) or len(main_translate) < 4 or not main_translate[2]:
+        raise ValueError("Invalid main_translate in response of provider.")
+    return main_translate
@@ -2,23 +2,35 @@ import uuid
 
 import logging
 
-from django.db.models import Q
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Q, F, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.text import slugify
 from drf_yasg import openapi
 from drf_yasg.inspectors import SwaggerAutoSchema
 from drf_yasg.utils import swagger_auto_schema
 
 from rest_framework import generics, viewsets, status, mixins
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
 from simcont import settings
-from .models import Vocabulary, Lemma, Lang, VocabularyLemma, Education, Board, EducationLemma
+from .models import Vocabulary, Lemma, Lang, VocabularyLemma, Education, Board, EducationLemma, VocabularySource, \
+    LemmaTranslation, LearnerVocabulary
 from .serializers import VocabularySerializer, LemmaSerializer, TranslateLemmaSerializer, LanguageSerializer, \
-    EducationSerializer, BoardSerializer, EducationLemmaSerializer, VocabularyLemmaSerializer
+    EducationSerializer, BoardSerializer, EducationLemmaSerializer, VocabularyLemmaSerializer, \
+    VocabularySourceSerializer, VocabularyProcessingSerializer, VocabularyLearnersSerializer, FrequencyLemmaSerializer
 from .signals import translate_lemma_signal
+from .export import EXPORT_FORMATS, aiter_chunks, iter_vocabulary_rows
+from .pagination import VocabularyPagination, LemmaPagination, EducationPagination, BoardPagination, \
+    FrequencyKeysetPagination
+from .importer import IMPORT_FORMATS, FrequencyListError, get_file_format, iter_frequency_list, import_frequency_list
 # from .tasks import translate_lemma_async
 
 from .langutils import SimVoc
@@ -42,6 +54,7 @@ class VocabularyViewSet(viewsets.ModelViewSet):
     queryset = Vocabulary.objects.all()
     serializer_class = VocabularySerializer
     permission_classes = [IsAuthenticated | IsAdminUser]
+    pagination_class = VocabularyPagination
 
     my_tags = ['Vocabulary']
 
@@ -63,10 +76,12 @@ class VocabularyViewSet(viewsets.ModelViewSet):
             except Vocabulary.DoesNotExist:
                 return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
+        # Related objects of page are loaded by one query for each relation
+        queryset = Vocabulary.objects.select_related('author').prefetch_related('learners')
         if user.is_staff:
-            return Vocabulary.objects.all()
+            return queryset.all()
 
-        return Vocabulary.objects.filter(Q(learners=user) | Q(author=user))
+        return queryset.filter(Q(learners=user) | Q(author=user))
 
     @action(methods=['get'], detail=False, serializer_class=LanguageSerializer)
     def languages(self, request):
@@ -91,6 +106,215 @@ class VocabularyViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(lang)
         return Response(serializer.data)
 
+    @action(methods=['get'], detail=True, serializer_class=VocabularyProcessingSerializer)
+    def processing(self, request, pk=None):
+        """
+        Get status and progress (percent) of processing source text of vocabulary.
+        """
+        user = request.user
+        vocabulary_qs = Vocabulary.objects.filter(pk=pk)
+        if not user.is_staff:
+            vocabulary_qs = vocabulary_qs.filter(Q(learners=user) | Q(author=user))
+        vocabulary = vocabulary_qs.only('id', 'processing_status', 'processing_progress').first()
+        if vocabulary is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = self.get_serializer(vocabulary)
+        return Response(serializer.data)
+
+    @swagger_auto_schema(methods=['post', 'delete'], request_body=VocabularyLearnersSerializer)
+    @action(methods=['post', 'delete'], detail=True, serializer_class=VocabularyLearnersSerializer)
+    def learners(self, request, pk=None):
+        """
+        Add (POST) or remove (DELETE) learners of vocabulary in one transaction. Only for author of vocabulary.
+        Body: {"learners_id": [id, ...]}
+        """
+        user = request.user
+        vocabulary = Vocabulary.objects.filter(pk=pk).only('id', 'author').first()
+        if vocabulary is None or (not user.is_staff and vocabulary.author_id != user.id):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        learners_id = serializer.validated_data['learners_id']
+        with transaction.atomic():
+            if request.method == 'POST':
+                changed = vocabulary.add_learners(learners_id)
+            else:
+                changed = vocabulary.remove_learners(learners_id)
+
+        return Response({
+            "changed": changed,
+            "learners_id": list(LearnerVocabulary.objects.filter(
+                throughVocabulary=vocabulary
+            ).values_list('throughLearner', flat=True)),
+        })
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'file_format',
+                openapi.IN_QUERY,
+                description="Format of file: csv (default), ndjson or anki (TSV for import to Anki)",
+                type=openapi.TYPE_STRING,
+                enum=list(EXPORT_FORMATS),
+            ),
+            openapi.Parameter(
+                'lang_to',
+                openapi.IN_QUERY,
+                description="Language of translations, by default lang_to of vocabulary",
+                type=openapi.TYPE_STRING,
+            ),
+        ],
+        responses={
+            200: 'File with lemmas',
+            400: 'Bad Request',
+            404: 'Not Found'
+        }
+    )
+    @action(methods=['get'], detail=True)
+    def export(self, request, pk=None):
+        """
+        Export lemmas of vocabulary with frequencies and translations by one streaming response.
+        """
+        user = request.user
+        vocabulary_qs = Vocabulary.objects.filter(pk=pk)
+        if not user.is_staff:
+            vocabulary_qs = vocabulary_qs.filter(Q(learners=user) | Q(author=user))
+        vocabulary = vocabulary_qs.select_related('lang_to').only('id', 'title', 'lang_to__short_name').first()
+        if vocabulary is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({"detail": "Invalid value for 'file_format'."}, status=status.HTTP_400_BAD_REQUEST)
+        lang_to = request.query_params.get('lang_to', vocabulary.lang_to.short_name)
+        if lang_to != vocabulary.lang_to.short_name and not Lang.objects.filter(short_name=lang_to).exists():
+            return Response({"detail": "Invalid value for 'lang_to'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        export_function, content_type, extension = EXPORT_FORMATS[file_format]
+        content = export_function(iter_vocabulary_rows(vocabulary.pk, lang_to))
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_chunks(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        filename = slugify(vocabulary.title) or 'vocabulary'
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+        return response
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'file',
+                openapi.IN_FORM,
+                description="Frequency list: CSV with header (lemma, frequency, pos), JSON list or NDJSON of objects",
+                type=openapi.TYPE_FILE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'file_format',
+                openapi.IN_FORM,
+                description="Format of file, by default it is defined by extension of file",
+                type=openapi.TYPE_STRING,
+                enum=list(IMPORT_FORMATS),
+            ),
+        ],
+        responses={
+            200: 'Numbers of imported lemmas',
+            400: 'Bad Request',
+            404: 'Not Found'
+        }
+    )
+    @action(methods=['post'], detail=True, url_path='import', url_name='import', parser_classes=[MultiPartParser, FormParser])
+    def import_lemmas(self, request, pk=None):
+        """
+        Import ready frequency list of lemmas to vocabulary without processing of text. Only for author of vocabulary.
+        Lemmas which exist in vocabulary get new frequency.
+        """
+        user = request.user
+        vocabulary = Vocabulary.objects.filter(pk=pk).only('id', 'author').first()
+        if vocabulary is None or (not user.is_staff and vocabulary.author_id != user.id):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        file_obj = request.FILES.get('file')
+        if file_obj is None:
+            return Response({"detail": "File is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                result = import_frequency_list(
+                    vocabulary.pk,
+                    iter_frequency_list(file_obj, get_file_format(file_obj, request.data.get('file_format'))),
+                )
+        except FrequencyListError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info("Imported lemmas to vocabulary %s: %s", vocabulary.pk, result)
+        return Response(result)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'lang_to',
+                openapi.IN_QUERY,
+                description="Language of translations, by default lang_to of vocabulary",
+                type=openapi.TYPE_STRING,
+            ),
+        ],
+    )
+    @action(
+        methods=['get'], detail=True, serializer_class=FrequencyLemmaSerializer,
+        pagination_class=FrequencyKeysetPagination
+    )
+    def lemmas(self, request, pk=None):
+        """
+        Lemmas of vocabulary ordered by frequency with translations to lang_to. Pages are linked by cursor
+        (field next), size of page is set by page_size (max 1000).
+        """
+        user = request.user
+        vocabulary_qs = Vocabulary.objects.filter(pk=pk)
+        if not user.is_staff:
+            vocabulary_qs = vocabulary_qs.filter(Q(learners=user) | Q(author=user))
+        vocabulary = vocabulary_qs.select_related('lang_to').only('id', 'lang_to__short_name').first()
+        if vocabulary is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        lang_to = request.query_params.get('lang_to', vocabulary.lang_to.short_name)
+        if lang_to != vocabulary.lang_to.short_name and not Lang.objects.filter(short_name=lang_to).exists():
+            return Response({"detail": "Invalid value for 'lang_to'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        translations = LemmaTranslation.objects.filter(lemma=OuterRef('pk'), lang=lang_to)
+        queryset = Lemma.objects.filter(
+            vocabularylemma__throughVocabulary=vocabulary.pk,
+        ).annotate(
+            frequency=F('vocabularylemma__frequency'),
+            lang_translate=Subquery(translations.values('translate')[:1]),
+            lang_translate_status=Coalesce(
+                Subquery(translations.values('translate_status')[:1]), Value(Lemma.TranslateStatus.ROOKIE.value)
+            ),
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=True, serializer_class=VocabularySourceSerializer)
+    def source_text(self, request, pk=None):
+        """
+        Get source text of vocabulary.
+        """
+        user = request.user
+        if not user.is_staff and not Vocabulary.objects.filter(
+                Q(pk=pk) & (Q(learners=user) | Q(author=user))
+        ).exists():
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            source = VocabularySource.objects.get(vocabulary=pk)
+        except VocabularySource.DoesNotExist:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = self.get_serializer(source)
+        return Response(serializer.data)
+
     @action(methods=['post', 'patch'], detail=True, serializer_class=VocabularyLemmaSerializer)
     @swagger_auto_schema(
         request_body=openapi.Schema(
@@ -167,6 +391,7 @@ class LemmaViewSet(viewsets.ModelViewSet):
     queryset = Lemma.objects.all()
     serializer_class = LemmaSerializer
     permission_classes = [IsAuthenticated | IsAdminUser]
+    pagination_class = LemmaPagination
 
     my_tags = ['Lemma']
 
@@ -204,7 +429,10 @@ class LemmaViewSet(viewsets.ModelViewSet):
 
         vocabularies = Vocabulary.objects.filter(Q(author=user) | Q(learners=user))
         lemmas_id = VocabularyLemma.objects.filter(throughVocabulary__in=vocabularies).values('throughLemma')
-        qs_result = Lemma.objects.filter(id__in=lemmas_id)
+        qs_result = Lemma.objects.filter(id__in=lemmas_id).prefetch_related(
+            Prefetch('vocabularies', queryset=Vocabulary.objects.only('id')),
+            Prefetch('educations', queryset=Education.objects.only('id')),
+        )
 
         return qs_result
 
@@ -234,21 +462,22 @@ class LemmaViewSet(viewsets.ModelViewSet):
         except Lemma.DoesNotExist:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        lang_to = request.query_params.get('lang_to', 'ru')
+        lang_to = request.query_params.get('lang_to', settings.DEFAULT_LANG_TO_TRANSLATE)
+        if not Lang.objects.filter(short_name=lang_to).exists():
+            return Response({"detail": "Invalid value for 'lang_to'."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if lemma.translate_status == Lemma.TranslateStatus.ROOKIE:
+        translation = LemmaTranslation.objects.filter(lemma=lemma, lang=lang_to).first()
+        if translation is None or translation.translate_status == Lemma.TranslateStatus.ROOKIE:
             translate_lemma_signal.send(sender=self.__class__, lemma=lemma, lang_to=lang_to)
+            translation = LemmaTranslation.objects.filter(lemma=lemma, lang=lang_to).first()
 
-            # Task for Celery
-            # translate_lemma_async.apply_async(
-            #     args=[lemma.pk, settings.DEFAULT_STRATEGY_TRANSLATE, lang_to],
-            #     countdown=0
-            # )
+            logger.info("Start process of translate lemma: %s, with strategy: %s",
+                        lemma.lemma, settings.DEFAULT_STRATEGY_TRANSLATE)
 
-            logger.info(f"Start process of translate lemma: {lemma.lemma}, "
-                        f"with strategy: {settings.DEFAULT_STRATEGY_TRANSLATE}")
+        if translation is None:
+            translation = LemmaTranslation(lemma=lemma, lang=lang_to, pos=lemma.pos)
 
-        serializer = self.get_serializer(lemma)
+        serializer = self.get_serializer(translation)
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -290,6 +519,7 @@ class EducationViewSet(viewsets.ModelViewSet):
     queryset = Education.objects.all()
     serializer_class = EducationSerializer
     permission_classes = [IsAuthenticated | IsAdminUser]
+    pagination_class = EducationPagination
 
     my_tags = ['Education']
 
@@ -305,22 +535,37 @@ class EducationViewSet(viewsets.ModelViewSet):
             try:
                 education = Education.objects.get(pk=pk)
                 if user.is_staff or user == education.learner:
-                    return Education.objects.filter(pk=pk)
+                    return self.prefetch_lemmas(Education.objects.filter(pk=pk))
                 else:
                     return Education.objects.none()
             except Education.DoesNotExist:
                 return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
         if user.is_staff:
-            return Education.objects.all()
+            return self.prefetch_lemmas(Education.objects.all())
+
+        return self.prefetch_lemmas(Education.objects.filter(learner=user))
 
-        return Education.objects.filter(learner=user)
+    @staticmethod
+    def prefetch_lemmas(queryset):
+        """
+        Vocabularies of educations with their lemmas ordered by frequency (list_lemmas) by two queries for page,
+        vocabulary shared by educations is loaded once.
+        """
+        return queryset.prefetch_related(Prefetch(
+            'vocabulary__vocabularylemma_set',
+            queryset=VocabularyLemma.objects.select_related('throughLemma').only(
+                'throughVocabulary_id', 'frequency', 'throughLemma__lemma'
+            ).order_by('-frequency'),
+            to_attr='frequency_lemmas',
+        ))
 
 
 class BoardViewSet(viewsets.ModelViewSet):
     queryset = Board.objects.all()
     serializer_class = BoardSerializer
     permission_classes = [IsAuthenticated | IsAdminUser]
+    pagination_class = BoardPagination
 
     my_tags = ['Board']
 
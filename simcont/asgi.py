@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'simcont.settings')
+# Under ASGI sync code of each request runs in new thread, so persistent connections of DB are never reused
+# and only pile up (Django ticket #33497): connection is closed after each request
+os.environ['DATABASE_CONN_MAX_AGE'] = '0'
 
 application = get_asgi_application()
@@ -1,5 +1,10 @@
 import os
+import time
+
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown, before_task_publish, task_prerun, task_postrun
+
+from . import log, prometheus
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'simcont.settings')
 
@@ -7,3 +12,73 @@ app = Celery('simcont')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
+
+# Start of execution of tasks in current process (task_id: time)
+_tasks_start = {}
+
+
+@worker_init.connect
+def preload_nlp_model(sender=None, **kwargs):
+    """
+    Load spaCy model in main process of worker which consumes queue 'nlp',
+    so processes of prefork pool get model ready after fork.
+    """
+    consume_from = sender.app.amqp.queues.consume_from
+    if not consume_from or 'nlp' in consume_from:
+        from drf_app.langutils import SimVoc
+        SimVoc.load_spacy_model()
+
+
+@worker_init.connect
+def start_metrics_server(sender=None, **kwargs):
+    """
+    Start local endpoint of Prometheus metrics in main process of worker if settings.TASK_METRICS_PORT is set.
+    """
+    from django.conf import settings
+    if settings.TASK_METRICS_PORT:
+        prometheus.start_metrics_server(
+            sender.app,
+            settings.TASK_METRICS_PORT,
+            settings.TASK_METRICS_ADDR,
+            os.environ.get('PROMETHEUS_MULTIPROC_DIR'),
+        )
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        prometheus.mark_process_dead(pid)
+
+
+# Connections of DB are reused by tasks: Django fixup of Celery closes before and after task only connections
+# which are unusable or older than CONN_MAX_AGE, and closes inherited connections in new process of pool.
+@worker_process_shutdown.connect
+def close_db_connections(**kwargs):
+    """
+    Close persistent connections of process of pool, so DB (or pgbouncer) doesn't wait for them.
+    """
+    from django.db import connections
+    connections.close_all()
+
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    headers.setdefault('published_at', time.time())
+
+
+@task_prerun.connect
+def observe_task_start(task_id=None, task=None, **kwargs):
+    log.task_id.set(task_id)
+    _tasks_start[task_id] = time.perf_counter()
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at:
+        prometheus.TASK_QUEUE_WAIT.labels(task.name).observe(max(time.time() - published_at, 0))
+
+
+@task_postrun.connect
+def observe_task_finish(task_id=None, task=None, state=None, **kwargs):
+    log.task_id.set(None)
+    start = _tasks_start.pop(task_id, None)
+    if start is not None:
+        prometheus.TASK_DURATION.labels(task.name).observe(time.perf_counter() - start)
+    prometheus.TASKS.labels(task.name, (state or 'unknown').lower()).inc()
@@ -0,0 +1,100 @@
+"""
+Structured non-blocking logging: records get id of request/task and are written to file
+in thread of QueueListener as JSON lines.
+"""
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from contextvars import ContextVar
+
+request_id: ContextVar = ContextVar('request_id', default=None)
+task_id: ContextVar = ContextVar('task_id', default=None)
+
+# Attributes of LogRecord, other attributes are extra fields of record
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'request_id', 'task_id'}
+_JSON_TYPES = (str, int, float, bool, type(None))
+
+
+class ContextFilter(logging.Filter):
+    """
+    Add id of current request and Celery task to record.
+    Filter is applied in thread which logs, before record is put to queue.
+    """
+    def filter(self, record):
+        record.request_id = request_id.get()
+        record.task_id = task_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Record as one JSON line, extra fields of record are added to JSON.
+    """
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'task_id': getattr(record, 'task_id', None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class QueueFileHandler(logging.handlers.QueueHandler):
+    """
+    Handler only puts rendered records to queue. Records are formatted and written to file by QueueListener
+    in separate thread, so threads of requests and tasks don't wait for disk.
+    """
+    def __init__(self, filename, encoding='utf-8'):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.FileHandler(filename, encoding=encoding, delay=True)
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+        # Thread of listener doesn't exist in child process after fork (prefork pool of Celery, gunicorn)
+        os.register_at_fork(after_in_child=self._start_listener_in_child)
+
+    def _start_listener_in_child(self):
+        if self.listener is not None:
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, self.target)
+            self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        """
+        Message, traceback and extra fields are rendered in thread which logs, as in QueueHandler.prepare:
+        they show state at the moment of call, __str__ of models doesn't query DB in thread of listener,
+        and queue doesn't keep frames of traceback alive. Only JSON and write to file are left to listener.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = (self.target.formatter or logging.Formatter()).formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not isinstance(value, _JSON_TYPES):
+                record.__dict__[key] = json.loads(json.dumps(value, ensure_ascii=False, default=str))
+        return record
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        super().close()
@@ -0,0 +1,57 @@
+"""
+Metrics of one request: number of SQL queries, time of DB and serializers.
+Metrics are collected only for sampled requests (see simcont.middleware.RequestMetricsMiddleware).
+"""
+import time
+from contextvars import ContextVar
+
+current_metrics: ContextVar = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Wrapper for connection.execute_wrapper(), count queries and time of DB
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def instrument_serializers() -> None:
+    """
+    Add time of DRF serializers to metrics of current request. Property data of BaseSerializer is wrapped once,
+    so all serializers (of any app and package) are measured, serializer which reads data of other serializer
+    inside is counted once. Time of DB queries made during serialization (lazy relations) is counted only as DB.
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    data = BaseSerializer.data
+    if getattr(data.fget, 'timed', False):
+        return
+
+    def timed_data(self):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializer_depth:
+            return data.fget(self)
+
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        db_start = metrics.db_time
+        try:
+            return data.fget(self)
+        finally:
+            metrics.serializer_depth -= 1
+            metrics.serializer_time += time.perf_counter() - start - (metrics.db_time - db_start)
+
+    timed_data.timed = True
+    BaseSerializer.data = property(timed_data)
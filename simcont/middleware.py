@@ -0,0 +1,127 @@
+import logging
+import random
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from . import log
+from .metrics import RequestMetrics, current_metrics, instrument_serializers
+
+logger = logging.getLogger('simcont.metrics')
+
+
+class RequestIdMiddleware:
+    """
+    Id of request (header X-Request-ID or new one) for records of log, it is returned in header X-Request-ID.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        token = log.request_id.set(request_id[:64])
+        try:
+            response = self.get_response(request)
+        finally:
+            log.request_id.reset(token)
+        response['X-Request-ID'] = request_id[:64]
+        return response
+
+    async def __acall__(self, request):
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        token = log.request_id.set(request_id[:64])
+        try:
+            response = await self.get_response(request)
+        finally:
+            log.request_id.reset(token)
+        response['X-Request-ID'] = request_id[:64]
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    For sampled requests (settings.REQUEST_METRICS_SAMPLE_RATE) log number of SQL queries, time of DB,
+    time of serializers (without DB), total time and size of response. Add the same data to header Server-Timing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_serializers()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if not sample_rate or random.random() >= sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if not sample_rate or random.random() >= sample_rate:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        # Async ORM runs queries in thread of sync_to_async (thread_sensitive), wrapper is added to its connection
+        await sync_to_async(lambda: connection.execute_wrappers.append(metrics))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(metrics))()
+            current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics, start)
+
+    def process_metrics(self, request, response, metrics, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = metrics.db_time * 1000
+        serializer_ms = metrics.serializer_time * 1000
+        size = None if response.streaming else len(response.content)
+
+        view = request.resolver_match.view_name if request.resolver_match else None
+        logger.info(
+            "Request metrics %s %s: %s queries, db %.1f ms, serializer %.1f ms, total %.1f ms, %s bytes",
+            request.method, view or request.path, metrics.queries, db_ms, serializer_ms, total_ms, size,
+            extra={
+                'view': view,
+                'method': request.method,
+                'status': response.status_code,
+                'queries': metrics.queries,
+                'db_ms': round(db_ms, 1),
+                'serializer_ms': round(serializer_ms, 1),
+                'total_ms': round(total_ms, 1),
+                'response_size': size,
+            }
+        )
+
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{metrics.queries} queries", '
+                f'serializer;dur={serializer_ms:.1f}, '
+                f'total;dur={total_ms:.1f}'
+            )
+        return response
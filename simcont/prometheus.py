@@ -0,0 +1,124 @@
+"""
+Prometheus metrics of Celery tasks, NLP ingestion and translations.
+Package prometheus_client is optional: without it metrics are not collected and functions do nothing.
+"""
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+
+def _metric(metric_type: str, name: str, documentation: str, labelnames=(), **kwargs):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return getattr(prometheus_client, metric_type)(name, documentation, labelnames, **kwargs)
+
+
+TASKS = _metric(
+    'Counter', 'simcont_celery_tasks', 'Finished Celery tasks by state', ('task', 'state')
+)
+TASK_DURATION = _metric(
+    'Histogram', 'simcont_celery_task_duration_seconds', 'Time of execution of Celery task', ('task',),
+    buckets=DURATION_BUCKETS
+)
+TASK_QUEUE_WAIT = _metric(
+    'Histogram', 'simcont_celery_task_queue_wait_seconds', 'Time from publish of Celery task to start of execution',
+    ('task',), buckets=DURATION_BUCKETS
+)
+NLP_STAGE_DURATION = _metric(
+    'Histogram', 'simcont_nlp_stage_duration_seconds', 'Time of stage of NLP ingestion', ('stage',),
+    buckets=DURATION_BUCKETS
+)
+NLP_TOKENS = _metric(
+    'Counter', 'simcont_nlp_tokens', 'Tokens processed by spaCy'
+)
+TRANSLATIONS = _metric(
+    'Counter', 'simcont_translations', 'Translations of lemmas by result', ('strategy', 'result')
+)
+TRANSLATION_DURATION = _metric(
+    'Histogram', 'simcont_translation_duration_seconds', 'Time of request to provider of translation',
+    ('strategy',), buckets=DURATION_BUCKETS
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Observe time of stage of NLP ingestion. Can be used as context manager or decorator.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        NLP_STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+
+class QueueDepthCollector:
+    """
+    Number of messages in queues of broker, it is read on each scrape of endpoint.
+    """
+    def __init__(self, app, queues):
+        self.app = app
+        self.queues = queues
+
+    def collect(self):
+        depth = GaugeMetricFamily('simcont_celery_queue_depth', 'Messages waiting in queue of broker', labels=['queue'])
+        try:
+            with self.app.connection_for_read() as conn:
+                for queue in self.queues:
+                    try:
+                        _, message_count, _ = conn.default_channel.queue_declare(queue=queue, passive=True)
+                    except conn.channel_errors:
+                        # Broker doesn't keep empty queue (Redis)
+                        message_count = 0
+                    depth.add_metric([queue], message_count)
+        except Exception as e:
+            logger.warning("Depth of queues is not available: %s", e)
+        yield depth
+
+
+def start_metrics_server(app, port: int, addr: str, multiproc_dir: str = None) -> bool:
+    """
+    Start local HTTP endpoint with metrics. With multiproc_dir (env PROMETHEUS_MULTIPROC_DIR) metrics of all
+    processes of prefork pool are collected, else only metrics of current process.
+    """
+    if prometheus_client is None:
+        logger.warning("prometheus_client is not installed, metrics endpoint is not started.")
+        return False
+
+    if multiproc_dir:
+        from prometheus_client import multiprocess
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    registry.register(QueueDepthCollector(app, list(app.amqp.queues.keys())))
+    prometheus_client.start_http_server(port, addr=addr, registry=registry)
+    logger.info("Metrics endpoint started on %s:%s", addr, port)
+    return True
+
+
+def mark_process_dead(pid: int) -> None:
+    if prometheus_client is not None:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
@@ -14,7 +14,8 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
-from decouple import config
+from decouple import config, Csv
+from kombu import Queue
 
 # Read .env
 DJANGO_ENV = config('DJANGO_ENV')
@@ -28,13 +29,42 @@ DATABASE_DB = config("DEFAULT_DATABASE_DB")
 DATABASE_USER = config("DEFAULT_DATABASE_USER")
 DATABASE_PASSWORD = config("DEFAULT_DATABASE_PASSWORD")
 DATABASE_PORT = config("DEFAULT_DATABASE_PORT")
+# Seconds of life of persistent connection: 0 - connection per request, None - unlimited
+DATABASE_CONN_MAX_AGE = config(
+    'DATABASE_CONN_MAX_AGE', default=60, cast=lambda value: None if value == 'None' else int(value)
+)
+DATABASE_CONNECT_TIMEOUT = config('DATABASE_CONNECT_TIMEOUT', default=5, cast=int)  # seconds
+DATABASE_PGBOUNCER = config('DATABASE_PGBOUNCER', default=False, cast=bool)  # connections go through pgbouncer
 
 NLP_MAX_LENGTH = config('NLP_MAX_LENGTH')
+NLP_SHARD_SIZE = config('NLP_SHARD_SIZE', default=50000, cast=int)  # words in one shard of text for lemmatize
+TRANSLATE_AFTER_INGEST = config('TRANSLATE_AFTER_INGEST', default=False, cast=bool)
+TRANSLATE_BATCH_LIMIT = config('TRANSLATE_BATCH_LIMIT', default=100, cast=int)
+TRANSLATE_CLAIM_TIMEOUT = config('TRANSLATE_CLAIM_TIMEOUT', default=600, cast=int)  # seconds in IN_PROGRESS
+TRANSLATE_MAX_ATTEMPTS = config('TRANSLATE_MAX_ATTEMPTS', default=5, cast=int)  # requeues before FAILED
 DEFAULT_STRATEGY_TRANSLATE = config('DEFAULT_STRATEGY_TRANSLATE')
+# Fallback chain of strategies (drf_app.translation), strategy of task is tried first
+TRANSLATE_STRATEGIES = config('TRANSLATE_STRATEGIES', default=DEFAULT_STRATEGY_TRANSLATE, cast=Csv())
+TRANSLATE_PROVIDER_TIMEOUT = config('TRANSLATE_PROVIDER_TIMEOUT', default=20, cast=float)  # seconds
+# Threads of each provider, not less than concurrency of translate worker (more calls are sent to fallback)
+TRANSLATE_PROVIDER_THREADS = config('TRANSLATE_PROVIDER_THREADS', default=50, cast=int)
+TRANSLATE_BREAKER_FAILURES = config('TRANSLATE_BREAKER_FAILURES', default=5, cast=int)  # failures in a row
+TRANSLATE_BREAKER_RESET = config('TRANSLATE_BREAKER_RESET', default=60, cast=int)  # seconds provider is skipped
+DEFAULT_LANG_TO_TRANSLATE = config('DEFAULT_LANG_TO_TRANSLATE', default='ru')
 OPENAI_API_KEY = config('OPENAI_API_KEY')
 
 REDIS_PORT = config('REDIS_PORT')
 
+# Cache shared by all web and Celery workers: users of JWT authentication, breakers of translation providers
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default=f'redis://localhost:{REDIS_PORT}/1')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'simcont',
+    }
+}
+
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 PASSWORD_EMAIL = config('PASSWORD_EMAIL')
@@ -65,7 +95,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',
     'rest_framework',
     'drf_yasg',  # https://drf-yasg.readthedocs.io/en/stable/index.html
     'users.apps.UsersConfig',
@@ -74,13 +103,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'simcont.middleware.RequestIdMiddleware',
+    'simcont.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
 ROOT_URLCONF = 'simcont.urls'
@@ -115,6 +145,14 @@ DATABASES = {
         'PASSWORD': DATABASE_PASSWORD,
         'HOST': DATABASE_HOSTNAME,
         'PORT': DATABASE_PORT,
+        # Connection is kept between requests (and Celery tasks) and checked before reuse
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # pgbouncer in transaction mode doesn't keep server-side cursors (QuerySet.iterator) between queries
+        'DISABLE_SERVER_SIDE_CURSORS': DATABASE_PGBOUNCER,
+        'OPTIONS': {
+            'connect_timeout': DATABASE_CONNECT_TIMEOUT,
+        },
     },
 }
 
@@ -162,11 +200,23 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # ******** For debug tool django-debug-toolbar ***************
+# Only for DEBUG, toolbar adds overhead to each request
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 # ******** End debug tool django-debug-toolbar block *********
 
+# ******** Metrics of requests (simcont.middleware.RequestMetricsMiddleware) ***************
+# Part of requests (0..1) for which number of SQL queries, time of DB and serializers are logged
+REQUEST_METRICS_SAMPLE_RATE = config('REQUEST_METRICS_SAMPLE_RATE', default=1.0 if DEBUG else 0.05, cast=float)
+# Add header Server-Timing to sampled responses
+REQUEST_METRICS_SERVER_TIMING = config('REQUEST_METRICS_SERVER_TIMING', default=True, cast=bool)
+# ******** End metrics of requests *********
+
 
 # **************Setting for Auth by Email:********************
 # https://medium.com/@therealak12/authenticate-using-email-instead-of-username-in-django-rest-framework-857645037bab
@@ -177,15 +227,18 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 # For tell Django to use this backend as the default authentication backend.
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
     'users.auth_backends.EmailBackend',
 ]
+# Seconds of cache of user for JWT authentication (users.authentication.CachedJWTAuthentication)
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+# Seconds of validity of activation code (users.models.ActivationCode) since sending by email
+ACTIVATION_CODE_LIFETIME = config('ACTIVATION_CODE_LIFETIME', default=24 * 60 * 60, cast=int)
 # ************* End Auth by Email Block*************************
 
 # ***************** REST Framework *****************
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication' if DJANGO_ENV == 'DEV' else None,
         'rest_framework.authentication.BasicAuthentication' if DJANGO_ENV == 'DEV' else None,
         'rest_framework.authentication.SessionAuthentication' if DJANGO_ENV == 'DEV' else None,
@@ -194,9 +247,12 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer' if DJANGO_ENV == 'DEV' else None,  # On/Off DRF interface
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
-    'PAGE_SIZE': 5,
+    # Client sets size of page by limit or page_size up to max_limit of endpoint (drf_app.pagination)
+    'DEFAULT_PAGINATION_CLASS': 'drf_app.pagination.SizedLimitOffsetPagination',
+    'PAGE_SIZE': config('PAGE_SIZE', default=20, cast=int),
 }
+# Max size of page for endpoints without own limit
+MAX_PAGE_SIZE = config('MAX_PAGE_SIZE', default=100, cast=int)
 # ***************** END DRF *****************
 
 
@@ -231,24 +287,100 @@ CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
 CELERY_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
+# Queues by type of work, each queue has own worker profile (see README):
+#   nlp - CPU-heavy stages of order_lemmas pipeline, prefork pool with preloaded spaCy model
+#   translate, email - network-bound tasks, threads pool with high concurrency
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_DEFAULT_ROUTING_KEY = 'default'
+CELERY_TASK_QUEUES = (
+    Queue('default', routing_key='default'),
+    Queue('nlp', routing_key='nlp'),
+    Queue('translate', routing_key='translate'),
+    Queue('email', routing_key='email'),
+)
+# Priority inside queue: 0 is the highest (Redis broker)
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_ROUTES = {
+    'drf_app.tasks.extract_source_text_async': {'queue': 'nlp', 'priority': 5},
+    'drf_app.tasks.clean_source_text_async': {'queue': 'nlp', 'priority': 5},
+    'drf_app.tasks.lemmatize_shard_async': {'queue': 'nlp', 'priority': 5},
+    'drf_app.tasks.merge_order_lemmas_async': {'queue': 'nlp', 'priority': 5},
+    'drf_app.tasks.ingest_order_lemmas_async': {'queue': 'nlp', 'priority': 5},
+    'drf_app.tasks.translate_vocabulary_lemmas_async': {'queue': 'translate', 'priority': 7},
+    'drf_app.tasks.translate_lemma_async': {'queue': 'translate', 'priority': 3},
+    'users.tasks.send_activation_email_async': {'queue': 'email', 'priority': 0},
+    'djcelery_email_send_multiple': {'queue': 'email', 'priority': 0},
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'visibility_timeout': 4 * 60 * 60,  # more than the longest NLP task, else task is delivered again
+}
+# Worker reserves only task which it executes, so short tasks don't wait behind long ones
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Periodic tasks, start: celery -A simcont beat
+CELERY_BEAT_SCHEDULE = {
+    'requeue-stuck-translations': {
+        'task': 'drf_app.tasks.requeue_stuck_translations_async',
+        'schedule': 300.0,
+    },
+    'purge-activation-codes': {
+        'task': 'users.tasks.purge_activation_codes_async',
+        'schedule': 3600.0,
+    },
+}
+
 # CELERY_TASK_DEFAULT_EXPIRES = 3600  # Time to expired task
+
+# Worker keeps settings.LOGGING instead of own handlers of Celery
+CELERY_WORKER_HIJACK_ROOT_LOGGER = False
+
+# Prometheus metrics of tasks: local endpoint in main process of worker, 0 - switch off.
+# For prefork pool set env PROMETHEUS_MULTIPROC_DIR to collect metrics of all processes of pool.
+TASK_METRICS_PORT = config('TASK_METRICS_PORT', default=0, cast=int)
+TASK_METRICS_ADDR = config('TASK_METRICS_ADDR', default='127.0.0.1')
 # ************* END Celery *************************
 
+# ************* Async views and notifications *************************
+# Redis pub/sub: tasks notify async views (drf_app.async_views) about finished translations and vocabularies
+NOTIFY_REDIS_URL = config('NOTIFY_REDIS_URL', default=f'redis://localhost:{REDIS_PORT}/0')
+ASYNC_WAIT_MAX = config('ASYNC_WAIT_MAX', default=30, cast=int)  # max seconds of param wait of async endpoints
+# Server-Sent Events (api/v1/async/events/): max duration of stream, interval of keepalive, max lemmas+vocabularies
+ASYNC_STREAM_MAX = config('ASYNC_STREAM_MAX', default=300, cast=int)
+ASYNC_STREAM_KEEPALIVE = config('ASYNC_STREAM_KEEPALIVE', default=15, cast=int)
+ASYNC_STREAM_CHANNELS_MAX = config('ASYNC_STREAM_CHANNELS_MAX', default=100, cast=int)
+# ************* END Async views and notifications *************************
+
 # ************* Logging *************************
 # LOGGING_LEVEL = logging.DEBUG if DEBUG else logging.INFO
 LOGGING_LEVEL = logging.INFO
 
+# In production records are written to file as JSON lines by thread of QueueListener (simcont.log)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'context': {
+            '()': 'simcont.log.ContextFilter',
+        },
+    },
+    'formatters': {
+        'json': {
+            '()': 'simcont.log.JsonFormatter',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'level': LOGGING_LEVEL,
         },
         'file': {
-            'class': 'logging.FileHandler',
+            'class': 'simcont.log.QueueFileHandler',
             'filename': 'logs/file.log',
+            'formatter': 'json',
+            'filters': ['context'],
         },
     },
     'root': {
@@ -259,12 +391,7 @@ LOGGING = {
         'django': {
             'handlers': ['console' if DEBUG else 'file'],
             'level': LOGGING_LEVEL,
-            'propagate': True,
-        },
-        '__name__': {
-            'handlers': ['console' if DEBUG else 'file'],
-            'level': LOGGING_LEVEL,
-            'propagate': True,
+            'propagate': False,
         },
     },
 }
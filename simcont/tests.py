@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+from rest_framework import serializers
+
+from simcont import log
+from simcont.metrics import RequestMetrics, current_metrics, instrument_serializers
+
+logger = logging.getLogger(__name__)
+
+
+class LogTests(SimpleTestCase):
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.log_dir.name, 'file.log')
+        self.handler = log.QueueFileHandler(self.filename)
+        self.handler.setFormatter(log.JsonFormatter())
+        self.handler.addFilter(log.ContextFilter())
+        self.test_logger = logging.getLogger('simcont.tests.queue')
+        self.test_logger.addHandler(self.handler)
+        self.test_logger.propagate = False
+
+    def tearDown(self):
+        self.test_logger.removeHandler(self.handler)
+        self.handler.close()
+        self.log_dir.cleanup()
+
+    def read_records(self) -> list:
+        self.handler.close()
+        with open(self.filename, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_json_record(self):
+        logger.info(f"test_json_record")
+        token = log.request_id.set('req-1')
+        try:
+            self.test_logger.warning("Lemma %s translated", 'test', extra={'queries': 3})
+        finally:
+            log.request_id.reset(token)
+
+        record, = self.read_records()
+        self.assertEqual(record['message'], 'Lemma test translated')
+        self.assertEqual(record['level'], 'WARNING')
+        self.assertEqual(record['request_id'], 'req-1')
+        self.assertIsNone(record['task_id'])
+        self.assertEqual(record['queries'], 3)
+
+    def test_json_record_exception(self):
+        logger.info(f"test_json_record_exception")
+        try:
+            raise ValueError('wrong lemma')
+        except ValueError:
+            self.test_logger.exception("Failed")
+
+        record, = self.read_records()
+        self.assertIn('ValueError: wrong lemma', record['exc_info'])
+
+    def test_record_rendered_in_caller_thread(self):
+        logger.info(f"test_record_rendered_in_caller_thread")
+        lemmas = ['test']
+        self.test_logger.info("Lemmas %s", lemmas, extra={'lemmas': lemmas})
+        lemmas.append('changed')
+
+        record, = self.read_records()
+        self.assertEqual(record['message'], "Lemmas ['test']")
+        self.assertEqual(record['lemmas'], ['test'])
+
+
+class SerializerMetricsTests(SimpleTestCase):
+    def test_serializer_time_without_db(self):
+        logger.info(f"test_serializer_time_without_db")
+        instrument_serializers()
+        metrics = RequestMetrics()
+
+        class NameSerializer(serializers.Serializer):
+            name = serializers.CharField()
+
+        class ItemSerializer(serializers.Serializer):
+            name = serializers.CharField()
+            related = serializers.SerializerMethodField()
+
+            def get_related(self, obj):
+                # Query of lazy relation during serialization
+                time.sleep(0.05)
+                metrics.db_time += 0.05
+                return NameSerializer({'name': f"related {obj['name']}"}).data
+
+        token = current_metrics.set(metrics)
+        try:
+            data = ItemSerializer([{'name': 'first'}, {'name': 'second'}], many=True).data
+        finally:
+            current_metrics.reset(token)
+
+        self.assertEqual(data[0]['related']['name'], 'related first')
+        # Nested serializer isn't counted twice and time of DB isn't counted as time of serializer
+        self.assertGreater(metrics.serializer_time, 0)
+        self.assertLess(metrics.serializer_time, 0.05)
+        self.assertEqual(metrics.serializer_depth, 0)
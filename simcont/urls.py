@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from . import settings
 from drf_app.views import *
+from drf_app import async_views
 from rest_framework import routers
 
 # For Swagger
@@ -53,10 +54,14 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
-    path("__debug__/", include("debug_toolbar.urls")),
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Async endpoints for ASGI (drf_app.async_views)
+    path('api/v1/async/lemma/<uuid:pk>/translate/', async_views.lemma_translate, name='async-lemma-translate'),
+    path('api/v1/async/vocabulary/<uuid:pk>/processing/', async_views.vocabulary_processing,
+         name='async-vocabulary-processing'),
+    path('api/v1/async/events/', async_views.events, name='async-events'),
     path('api/v1/', include(router.urls)),   # http://127.0.0.1:8000/api/v1/.../ CRUD
     path('api/v1/drf-auth/', include('rest_framework.urls')) if settings.DJANGO_ENV == 'DEV' else None,
 ]
@@ -64,3 +69,4 @@ urlpatterns = [
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns.append(path("__debug__/", include("debug_toolbar.urls")))
@@ -3,17 +3,25 @@ from django.contrib.auth.backends import ModelBackend
 
 
 class EmailBackend(ModelBackend):
+    """
+    The only backend of project (settings.AUTHENTICATION_BACKENDS): login by email (or username, it is email too).
+    Password is hashed once for each attempt, for unknown email too, so time of answer doesn't show if user exists.
+    """
     def authenticate(self, request, **kwargs):
         UserModel = get_user_model()
+        email = kwargs.get('email', None)
+        if email is None:
+            email = kwargs.get('username', None)
+        password = kwargs.get('password', None)
+        if email is None or password is None:
+            return None
         try:
-            email = kwargs.get('email', None)
-            if email is None:
-                email = kwargs.get('username', None)
             user = UserModel.objects.get(email=email)
-            if user.check_password(kwargs.get('password', None)):
-                return user
         except UserModel.DoesNotExist:
+            UserModel().set_password(password)
             return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
         return None
 
     # Added from https://proproprogs.ru/django4/django4-avtorizaciya-cherez-email-profayl-polzovatelya
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import CustomUser
+
+
+def user_version_key(user_id) -> str:
+    return f"auth:user:{user_id}:version"
+
+
+def get_cached_user(user_id):
+    """
+    User by id from cache (settings.AUTH_USER_CACHE_TIMEOUT seconds) or from DB, None if user doesn't exist.
+    Key of user contains version of user, version is read before DB, so user loaded before save isn't cached
+    for new version.
+    """
+    version = cache.get(user_version_key(user_id), 0)
+    key = f"auth:user:{user_id}:{version}"
+    user = cache.get(key)
+    if user is None:
+        user = CustomUser.objects.filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_cached_user(user_id) -> None:
+    """
+    New version of user, cached copies of previous version are not read more.
+    """
+    try:
+        cache.incr(user_version_key(user_id))
+    except ValueError:
+        cache.set(user_version_key(user_id), 1, None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication with user from cache, request with cached user makes no query to DB.
+    Cache of user is invalidated on save and delete of CustomUser (users.signals).
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def move_activation_codes(apps, schema_editor):
+    # Codes of not activated users are moved to new table, they are valid ACTIVATION_CODE_LIFETIME since migration
+    CustomUser = apps.get_model('users', 'CustomUser')
+    ActivationCode = apps.get_model('users', 'ActivationCode')
+    codes = {}
+    for user_id, code in CustomUser.objects.filter(
+            is_active=False, activation_code__isnull=False
+    ).exclude(activation_code='').values_list('id', 'activation_code').iterator():
+        codes.setdefault(code, user_id)  # codes weren't unique, repeated code is kept for the first user
+    ActivationCode.objects.bulk_create(
+        [ActivationCode(user_id=user_id, code=code) for code, user_id in codes.items()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_customuser_activation_code_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivationCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=6, unique=True)),
+                ('time_create', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='activation', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(move_activation_codes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='activation_code',
+        ),
+    ]
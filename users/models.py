@@ -1,7 +1,9 @@
 import os
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.utils.crypto import get_random_string
@@ -53,7 +55,6 @@ class CustomUser(AbstractUser):
     avatar = models.ImageField(upload_to=upload_to, null=True, blank=True)
 
     is_active = models.BooleanField(default=False)
-    activation_code = models.CharField(max_length=6, blank=True, null=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -64,12 +65,68 @@ class CustomUser(AbstractUser):
     def generate_activation_code():
         return get_random_string(length=6)
 
-    def save(self, *args, **kwargs):
-        if not self.id and not self.activation_code:
-            self.activation_code = self.generate_activation_code()
+    def __str__(self):
+        return self.email
+
+
+class ActivationCode(models.Model):
+    """
+    Code of activation of new user (sent by email), one code for user.
+    Code is found by unique index and is valid settings.ACTIVATION_CODE_LIFETIME seconds,
+    expired codes are deleted by periodic task users.tasks.purge_activation_codes_async.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='activation')
+    code = models.CharField(max_length=6, unique=True)
+    time_create = models.DateTimeField(default=timezone.now, db_index=True)
+
+    ISSUE_ATTEMPTS = 3
+
+    @staticmethod
+    def expired_before():
+        return timezone.now() - timedelta(seconds=settings.ACTIVATION_CODE_LIFETIME)
+
+    @staticmethod
+    def issue(user_id) -> str:
+        """
+        Create new code of user (previous one is replaced). Code which belongs to other user is generated again.
+        """
+        for attempt in range(ActivationCode.ISSUE_ATTEMPTS):
+            code = CustomUser.generate_activation_code()
+            try:
+                with transaction.atomic():
+                    ActivationCode.objects.update_or_create(
+                        user_id=user_id,
+                        defaults={'code': code, 'time_create': timezone.now()},
+                    )
+                return code
+            except IntegrityError:
+                if attempt == ActivationCode.ISSUE_ATTEMPTS - 1:
+                    raise
+
+    @staticmethod
+    def activate(code: str):
+        """
+        Activate user by valid code, code is deleted. Return user or None if code is unknown or expired.
+        """
+        with transaction.atomic():
+            activation = ActivationCode.objects.select_for_update().select_related('user').filter(
+                code=code,
+                time_create__gte=ActivationCode.expired_before(),
+                user__is_active=False,
+            ).first()
+            if activation is None:
+                return None
+            user = activation.user
+            user.is_active = True
+            user.save(update_fields=['is_active'])
+            activation.delete()
+        return user
 
-        super().save(*args, **kwargs)
+    @staticmethod
+    def purge() -> int:
+        deleted, _ = ActivationCode.objects.filter(time_create__lt=ActivationCode.expired_before()).delete()
+        return deleted
 
     def __str__(self):
-        return self.email
+        return f"{self.user_id}: {self.code}"
 
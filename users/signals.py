@@ -1,8 +1,10 @@
 import logging
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .authentication import invalidate_cached_user
 from .models import CustomUser
 
 from .tasks import send_activation_email_async
@@ -12,9 +14,20 @@ logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=CustomUser)
 def send_activation_email(sender, instance, created, **kwargs):
-    logger.info(f'Send data to Celery for send activation email: {instance.email}')
     if created:
-        # Send task to Celery
-        send_activation_email_async.delay(instance.id)
-        instance.save()
+        logger.info('Send data to Celery for send activation email: %s', instance.email)
+        # Send task to Celery after commit, so worker finds user
+        user_id = instance.id
+        transaction.on_commit(lambda: send_activation_email_async.delay(user_id))
+    return None
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_cache(sender, instance, **kwargs):
+    # Cached user of JWT authentication (users.authentication) must not outlive changes of user.
+    # Version is changed again after commit: request between save and commit could cache old row for new version
+    user_id = instance.pk
+    invalidate_cached_user(user_id)
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
     return None
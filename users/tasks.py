@@ -1,21 +1,32 @@
+import logging
+
 from celery import shared_task
 from django.core.mail import send_mail
-from .models import CustomUser
+from .models import ActivationCode, CustomUser
 from simcont import settings
 
+logger = logging.getLogger(__name__)
+
 
 @shared_task
 def send_activation_email_async(user_id):
     user = CustomUser.objects.get(pk=user_id)
-    activation_code = user.activation_code if user.activation_code else CustomUser.generate_activation_code()
-
-    user.activation_code = activation_code
-    user.save()
-    # user.save(update_fields=['activation_code'])
+    # Code is valid settings.ACTIVATION_CODE_LIFETIME seconds since sending
+    activation_code = ActivationCode.issue(user.pk)
 
     subject = f'Account activation'
     message = f'Your activation code: {activation_code}'
     from_email = settings.EMAIL_FROM
     recipient_list = [user.email]
 
-    send_mail(subject, message, from_email, recipient_list)
\ No newline at end of file
+    send_mail(subject, message, from_email, recipient_list)
+
+
+@shared_task
+def purge_activation_codes_async() -> None:
+    """
+    Periodic task (Celery beat): delete expired activation codes.
+    """
+    deleted = ActivationCode.purge()
+    logger.info("Deleted expired activation codes: %s", deleted)
+    return None
@@ -1,17 +1,22 @@
 import base64
 import os
 import unittest
+from datetime import timedelta
 
+from django.contrib.auth import authenticate
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db.models.signals import post_save
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 
 import logging
 
-from users.models import CustomUser
+from users.authentication import get_cached_user
+from users.models import ActivationCode, CustomUser
 from users.signals import send_activation_email
 
 if 'DJANGO_SETTINGS_MODULE' in os.environ:
@@ -52,7 +57,7 @@ class BaseUserCase(APITestCase):
         cls.user = get_user_model().objects.get(email=cls.user_data['email'])
 
         # Activate user
-        activation_data = {"activation_code": cls.user.activation_code}
+        activation_data = {"activation_code": ActivationCode.issue(cls.user.id)}
         cls.activation_response = cls.client.post('/users/activate/', activation_data, format='json')
 
         # Login by JWT-token
@@ -91,12 +96,84 @@ class RegistrationTestCase(BaseUserCase):
         self.assertIn('access', self.login_response.data)
         self.assertIn('refresh', self.login_response.data)
 
+    def test_activation_code(self):
+        logger.info(f"test_activation_code")
+        user = CustomUser.objects.create_user(email="inactive@example.com", password="testpassword")
+        url = reverse('user_activate')
+
+        code = ActivationCode.issue(user.id)
+        ActivationCode.objects.filter(user=user).update(time_create=timezone.now() - timedelta(
+            seconds=settings.ACTIVATION_CODE_LIFETIME + 1
+        ))
+        response = self.client.post(url, {"activation_code": code}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Expired code is deleted by periodic task
+        self.assertEqual(ActivationCode.purge(), 1)
+        self.assertFalse(ActivationCode.objects.filter(user=user).exists())
+
+        code = ActivationCode.issue(user.id)
+        response = self.client.post(url, {"activation_code": code}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.is_active)
+        self.assertFalse(ActivationCode.objects.filter(user=user).exists())
+
+        response = self.client.post(url, {"activation_code": code}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_get_profile(self):
         logger.info(f"test_get_profile")
         profile_response = self.authenticated_client.get('/users/profile/', format='json')
         self.assertEqual(profile_response.status_code, status.HTTP_200_OK)
         self.assertEqual(profile_response.data['email'], 'test@example.com')
 
+    def test_cached_user_of_token(self):
+        logger.info(f"test_cached_user_of_token")
+        cache.clear()
+        self.authenticated_client.get('/users/profile/', format='json')
+
+        # User of token is taken from cache
+        with self.assertNumQueries(0):
+            profile_response = self.authenticated_client.get('/users/profile/', format='json')
+        self.assertEqual(profile_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(profile_response.data['email'], 'test@example.com')
+
+        # Saved user is read again from DB
+        user = CustomUser.objects.get(email=self.user_data['email'])
+        user.is_active = False
+        user.save()
+        profile_response = self.authenticated_client.get('/users/profile/', format='json')
+        self.assertEqual(profile_response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        user.is_active = True
+        user.save()
+        with self.assertNumQueries(1):
+            profile_response = self.authenticated_client.get('/users/profile/', format='json')
+        self.assertEqual(profile_response.status_code, status.HTTP_200_OK)
+
+    def test_cached_user_invalidated_after_commit(self):
+        logger.info(f"test_cached_user_invalidated_after_commit")
+        cache.clear()
+        user = CustomUser.objects.get(email=self.user_data['email'])
+        with self.captureOnCommitCallbacks(execute=True):
+            user.is_active = False
+            user.save()
+            # Request between save and commit caches user for new version
+            get_cached_user(user.pk)
+
+        # Version is changed after commit, so user is read again from DB
+        with self.assertNumQueries(1):
+            self.assertFalse(get_cached_user(user.pk).is_active)
+
+    def test_email_backend(self):
+        logger.info(f"test_email_backend")
+        user = authenticate(email=self.user_data['email'], password=self.user_data['password'])
+        self.assertEqual(user.email, self.user_data['email'])
+        self.assertEqual(authenticate(username=self.user_data['email'], password=self.user_data['password']), user)
+        self.assertIsNone(authenticate(email=self.user_data['email'], password='wrongpassword'))
+        self.assertIsNone(authenticate(email='unknown@example.com', password=self.user_data['password']))
+
     def test_change_password(self):
         logger.info(f"test_change_password")
         password_data = {
@@ -8,6 +8,7 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .models import ActivationCode
 from .serializers import UserSerializer, TokenObtainPairSerializer, UserProfileSerializer
 
 
@@ -47,7 +48,7 @@ class UserActivationView(APIView):
         responses={
             200: 'User successfully activated',
             400: 'Error in request',
-            404: 'User not found or already activated',
+            404: 'User not found, already activated or code expired',
         }
     )
     def post(self, request, *args, **kwargs):
@@ -55,18 +56,12 @@ class UserActivationView(APIView):
         if not activation_code:
             return Response({'error': 'Activation code not provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = get_user_model().objects.get(activation_code=activation_code, is_active=False)
-        except get_user_model().DoesNotExist:
+        if ActivationCode.activate(activation_code) is None:
             return Response(
                 {'error': 'The user with the specified activation code was not found or is already activated'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        user.is_active = True
-        user.activation_code = None
-        user.save()
-
         return Response({'message': 'User successfully activated'}, status=status.HTTP_200_OK)
 
 